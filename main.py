@@ -1,3 +1,5 @@
+import logging
+import os
 import sys
 from PySide6.QtWidgets import QApplication
 from src.gui.main_window import MainGUI
@@ -6,6 +8,11 @@ from src.config import validate_config # Ensure config loads early
 
 def main():
     """Main application entry point."""
+    # Per-line diagnostics live at DEBUG; set TRANSLATEPDF_LOG_LEVEL=DEBUG to see them.
+    logging.basicConfig(
+        level=os.getenv("TRANSLATEPDF_LOG_LEVEL", "INFO"),
+        format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
     # Ensure environment variables are loaded and validated
     try:
         validate_config()
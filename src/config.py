@@ -1,9 +1,18 @@
+import asyncio
+import functools
 import os
+import weakref
+import httpx
 from dotenv import load_dotenv
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI, DefaultAsyncHttpxClient
+
+@functools.lru_cache(maxsize=1)
+def _load_env():
+    """Loads the .env file exactly once per process."""
+    load_dotenv()
 
 # Load environment variables from .env file
-load_dotenv()
+_load_env()
 
 # Azure Document Intelligence Config
 AZURE_DI_ENDPOINT = os.getenv("AZURE_DI_ENDPOINT")
@@ -16,16 +25,37 @@ AZURE_OPENAI_DEPLOYMENT_NAME = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
 AZURE_OPENAI_API_VERSION = os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-01") # Default if not set
 
 # --- OpenAI Client Initialization (using Azure settings) ---
+# One client per event loop: the GUI starts a fresh asyncio.run() loop for
+# every job, and httpx keepalive connections stay bound to the loop they
+# were opened on — reusing a process-wide client across runs fails on the
+# second job. Weak keys let an entry die with its (closed) loop.
+_clients_by_loop: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
 def get_openai_client():
-    """Initializes and returns the AzureOpenAI client."""
+    """Returns the AsyncAzureOpenAI client for the current event loop.
+
+    Cached per loop, so all callers within one run share a single client
+    (and its warm connection pool) while a later run gets a fresh one
+    instead of inheriting connections bound to a closed loop. Must be
+    called from within a running event loop.
+    """
     if not all([AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_API_KEY, AZURE_OPENAI_DEPLOYMENT_NAME]):
         raise ValueError("Azure OpenAI environment variables are not fully set.")
 
-    client = AzureOpenAI(
-        api_key=AZURE_OPENAI_API_KEY,
-        azure_endpoint=AZURE_OPENAI_ENDPOINT,
-        api_version=AZURE_OPENAI_API_VERSION
-    )
+    loop = asyncio.get_running_loop()
+    client = _clients_by_loop.get(loop)
+    if client is None:
+        # Pool sized for the translator's concurrent batches: enough
+        # keepalive connections that in-flight requests reuse warm TLS
+        # sessions instead of paying a handshake each.
+        client = AsyncAzureOpenAI(
+            api_key=AZURE_OPENAI_API_KEY,
+            azure_endpoint=AZURE_OPENAI_ENDPOINT,
+            api_version=AZURE_OPENAI_API_VERSION,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=32))
+        )
+        _clients_by_loop[loop] = client
     return client
 
 # --- Validation ---
@@ -41,6 +71,4 @@ def validate_config():
     if not all(required_aoai):
         print("Warning: Azure OpenAI environment variables missing.")
         # Depending on usage, might want to raise an error
-
-# Validate configuration on import
-validate_config() 
\ No newline at end of file
+ 
\ No newline at end of file
@@ -1,10 +1,17 @@
-from typing import List, Dict
-from ..models import Chunk, Block, MergedBlock, TranslatedBlock
+import asyncio
+from collections import defaultdict
+import fitz # PyMuPDF
+from typing import Callable, List, Dict, Optional
+from ..models import Chunk, MergedBlock, TranslatedBlock
 from .doc_parser import AzureDocumentParser
 from .text_merger import TextBlockMerger
+from .translation_cache import normalize_text
 from .translator import Translator
 from .layout_engine import LayoutEngine
-from .page_renderer import PageRenderer
+from .page_renderer import PageRenderer, _render_page
+
+# Upper bound on chunks processed concurrently (keeps Azure rate limits happy)
+MAX_CONCURRENT_CHUNKS = 8
 
 class ChunkProcessor:
     """Orchestrates the processing pipeline for a single chunk of PDF pages."""
@@ -21,20 +28,30 @@ class ChunkProcessor:
         self.layout_engine = layout_engine # Needed by PageRenderer
         self.page_renderer = page_renderer
 
-    def process_chunk(self, pdf_path: str, chunk: Chunk) -> Dict[int, bytes]:
+    def shutdown(self):
+        """Tears down the rendering process pool (safe to call repeatedly)."""
+        self.page_renderer.shutdown()
+
+    async def process_chunk(self, pdf_path: str, chunk: Chunk,
+                            pdf_doc: Optional[fitz.Document] = None) -> Dict[int, bytes]:
         """Processes a single chunk: parse, merge, translate, render."""
-        print(f"--- Starting processing for Chunk {chunk.id} (Pages {chunk.page_numbers[0]}-{chunk.page_numbers[1]}) ---")
-        rendered_pages: Dict[int, bytes] = {}
+        translated_blocks = await self._translate_chunk(pdf_path, chunk, pdf_doc)
+        if not translated_blocks:
+            return {}
+        return await self._render_chunk(pdf_path, chunk, translated_blocks)
 
+    async def _translate_chunk(self, pdf_path: str, chunk: Chunk,
+                               pdf_doc: Optional[fitz.Document] = None) -> List[TranslatedBlock]:
+        """Network half of the pipeline: parse, merge and translate a chunk."""
+        print(f"--- Starting processing for Chunk {chunk.id} (Pages {chunk.page_numbers[0]}-{chunk.page_numbers[1]}) ---")
         try:
             # 1. Parse with Document Intelligence
             print(f"Chunk {chunk.id}: Step 1 - Parsing document...")
-            initial_blocks = self.doc_parser.extract_blocks_for_chunk(pdf_path, chunk)
+            initial_blocks = await self.doc_parser.extract_blocks_for_chunk(pdf_path, chunk, pdf_doc)
             print(f"Chunk {chunk.id}: Step 1 - Parsing complete. Found {len(initial_blocks)} initial blocks.")
             if not initial_blocks:
                 print(f"Chunk {chunk.id}: No text blocks extracted. Skipping further processing.")
-                return {}
-            original_blocks_map: Dict[str, Block] = {b.id: b for b in initial_blocks}
+                return []
 
             # 2. Merge text blocks (Optional but recommended)
             print(f"Chunk {chunk.id}: Step 2 - Merging text blocks...")
@@ -43,23 +60,83 @@ class ChunkProcessor:
 
             # 3. Translate merged blocks
             print(f"Chunk {chunk.id}: Step 3 - Translating text blocks...")
-            print(f"Chunk {chunk.id}: Calling translator for {len(merged_blocks)} blocks.")
-            translated_blocks = self.translator.translate_blocks(merged_blocks, original_blocks_map)
-            print(f"Chunk {chunk.id}: Translator returned {len(translated_blocks)} blocks.")
+            # Repeated boilerplate (running heads, "Figure N", captions) shows
+            # up many times per chunk; translate each distinct text once and
+            # broadcast the result to every occurrence.
+            unique_map: Dict[str, MergedBlock] = {}
+            occurrences: Dict[str, List[MergedBlock]] = defaultdict(list)
+            for m_block in merged_blocks:
+                key = normalize_text(m_block.text)
+                unique_map.setdefault(key, m_block)
+                occurrences[key].append(m_block)
+            unique_blocks = list(unique_map.values())
+            if len(unique_blocks) < len(merged_blocks):
+                print(f"Chunk {chunk.id}: Deduplicated {len(merged_blocks)} blocks down to {len(unique_blocks)} unique texts.")
+
+            print(f"Chunk {chunk.id}: Calling translator for {len(unique_blocks)} blocks.")
+            unique_translated = await self.translator.translate_blocks(unique_blocks)
+            print(f"Chunk {chunk.id}: Translator returned {len(unique_translated)} blocks.")
+
+            # Scatter each unique translation back to all of its occurrences,
+            # rebuilding per-occurrence blocks so every copy keeps its own
+            # bbox and page.
+            translated_by_id = {tb.id: tb for tb in unique_translated}
+            translated_blocks: List[TranslatedBlock] = []
+            for key, representative in unique_map.items():
+                rep_translated = translated_by_id.get(representative.id)
+                if rep_translated is None:
+                    continue
+                for m_block in occurrences[key]:
+                    if m_block is representative:
+                        translated_blocks.append(rep_translated)
+                        continue
+                    translated_blocks.append(TranslatedBlock(
+                        id=m_block.id,
+                        original_text=m_block.text,
+                        translated_text=rep_translated.translated_text,
+                        bbox=m_block.bbox,
+                        page_number=m_block.page_number
+                    ))
             print(f"Chunk {chunk.id}: Step 3 - Translation complete. {len(translated_blocks)} blocks translated.")
             if not translated_blocks:
                 print(f"Chunk {chunk.id}: No blocks translated successfully. Skipping rendering.")
-                return {}
+            return translated_blocks
+        except Exception as e:
+            # More robust error logging
+            error_type = type(e).__name__
+            error_msg = str(e)
+            print(f"Error processing chunk {chunk.id}. Type: {error_type}, Message: {error_msg}")
+            import traceback
+            print(f"Traceback:\n{traceback.format_exc()}")
+            # Decide if we want to return partial results or empty dict on error
+            # For now, returning empty on any chunk error for simplicity
+            return []
 
+    async def _render_chunk(self, pdf_path: str, chunk: Chunk,
+                            translated_blocks: List[TranslatedBlock]) -> Dict[int, bytes]:
+        """Render half of the pipeline: draws translated blocks onto the pages."""
+        rendered_pages: Dict[int, bytes] = {}
+        try:
             # 4. Render translated text onto original pages
             print(f"Chunk {chunk.id}: Step 4 - Rendering translated text onto pages...")
-            unique_page_numbers = sorted(list(set(block.page_number for block in translated_blocks)))
-            print(f"Chunk {chunk.id}: Rendering for pages: {unique_page_numbers}")
-            
-            for page_num in unique_page_numbers:
-                 print(f"  Rendering page {page_num}...")
-                 page_specific_blocks = [b for b in translated_blocks if b.page_number == page_num]
-                 rendered_page_bytes = self.layout_engine.overlay_text_on_page(pdf_path, page_num, page_specific_blocks)
+            # Group blocks by page in a single pass instead of rescanning the
+            # whole block list once per page.
+            translated_by_page: Dict[int, List[TranslatedBlock]] = defaultdict(list)
+            for block in translated_blocks:
+                translated_by_page[block.page_number].append(block)
+            print(f"Chunk {chunk.id}: Rendering for pages: {sorted(translated_by_page)}")
+
+            # Dispatch every page of the chunk to the rendering process pool
+            # at once; pages are independent, so they render N-wide across
+            # cores while this coroutine just awaits the results.
+            loop = asyncio.get_running_loop()
+            pool = self.page_renderer._get_render_pool()
+            page_numbers = sorted(translated_by_page)
+            page_results = await asyncio.gather(*(
+                loop.run_in_executor(pool, _render_page,
+                                     pdf_path, page_num, translated_by_page[page_num])
+                for page_num in page_numbers))
+            for page_num, rendered_page_bytes in zip(page_numbers, page_results):
                  if rendered_page_bytes:
                      rendered_pages[page_num] = rendered_page_bytes
                      print(f"  Rendering page {page_num} complete ({len(rendered_page_bytes)} bytes).")
@@ -82,5 +159,126 @@ class ChunkProcessor:
         print(f"--- Finished processing for Chunk {chunk.id}. Returning {len(rendered_pages)} rendered pages. ---")
         return rendered_pages
 
-# Need to import time at the top
-import time 
\ No newline at end of file
+    async def process_all(self, pdf_path: str, chunks: List[Chunk],
+                          progress_callback: Optional[Callable[[Chunk], None]] = None,
+                          use_batch_api: bool = False,
+                          pdf_doc: Optional[fitz.Document] = None,
+                          on_chunk_rendered: Optional[Callable[[Dict[int, bytes]], None]] = None,
+                          max_concurrent: Optional[int] = None) -> Dict[int, bytes]:
+        """Processes all chunks concurrently, bounded by a semaphore.
+
+        Args:
+            pdf_path: Path to the original PDF file.
+            chunks: The chunks to process.
+            progress_callback: Optional callable invoked with each chunk as it
+                finishes (called from the event-loop thread).
+            use_batch_api: Route all translations through the Azure OpenAI
+                Batch API (50% cheaper, but completion may take hours).
+            pdf_doc: Optionally, an already-open fitz.Document for pdf_path,
+                shared so each chunk avoids re-parsing the file. Only used on
+                the event-loop thread (fitz handles are not thread-safe).
+            on_chunk_rendered: When given, each chunk's rendered pages are
+                handed to this callable as soon as they exist (so the caller
+                can stream them to disk) and are NOT accumulated in memory;
+                the return value is then an empty dict.
+            max_concurrent: Overrides MAX_CONCURRENT_CHUNKS, e.g. from a
+                user-facing "workers" option.
+
+        Returns:
+            A dictionary mapping page number to rendered page bytes, merged
+            across all chunks (empty when on_chunk_rendered is used).
+        """
+        if use_batch_api:
+            return await self._process_all_via_batch_api(pdf_path, chunks, progress_callback, pdf_doc, on_chunk_rendered)
+
+        semaphore = asyncio.Semaphore(max_concurrent or MAX_CONCURRENT_CHUNKS)
+
+        async def _process_bounded(chunk: Chunk) -> Dict[int, bytes]:
+            # Hold the semaphore only across the network stages (DI polling +
+            # translation): rendering a finished chunk then overlaps with the
+            # API waits of the chunks still inside the semaphore, instead of
+            # occupying one of their slots.
+            async with semaphore:
+                translated_blocks = await self._translate_chunk(pdf_path, chunk, pdf_doc)
+            result: Dict[int, bytes] = {}
+            if translated_blocks:
+                result = await self._render_chunk(pdf_path, chunk, translated_blocks)
+            if on_chunk_rendered is not None:
+                # Hand the pages off immediately so their bytes don't stay
+                # resident until every chunk has finished.
+                on_chunk_rendered(result)
+                result = {}
+            if progress_callback:
+                progress_callback(chunk)
+            return result
+
+        chunk_results = await asyncio.gather(*(_process_bounded(c) for c in chunks))
+
+        all_rendered_pages: Dict[int, bytes] = {}
+        for rendered in chunk_results:
+            all_rendered_pages.update(rendered)
+        return all_rendered_pages
+ 
+    async def _process_all_via_batch_api(self, pdf_path: str, chunks: List[Chunk],
+                                         progress_callback: Optional[Callable[[Chunk], None]] = None,
+                                         pdf_doc: Optional[fitz.Document] = None,
+                                         on_chunk_rendered: Optional[Callable[[Dict[int, bytes]], None]] = None) -> Dict[int, bytes]:
+        """Parses every chunk, translates everything in one Batch API job,
+        then renders chunk by chunk.
+
+        Blocks are keyed by "chunk_id:block_id" custom ids so the single
+        job's results can be scattered back to their chunks.
+        """
+        parsed: List[tuple] = []  # (chunk, merged_blocks)
+        texts_by_custom_id: Dict[str, str] = {}
+
+        for chunk in chunks:
+            initial_blocks = await self.doc_parser.extract_blocks_for_chunk(pdf_path, chunk, pdf_doc)
+            if not initial_blocks:
+                parsed.append((chunk, []))
+                continue
+            merged_blocks = self.text_merger.merge_blocks(initial_blocks)
+            parsed.append((chunk, merged_blocks))
+            for m_block in merged_blocks:
+                if m_block.text.strip():
+                    texts_by_custom_id[f"{chunk.id}:{m_block.id}"] = m_block.text
+
+        print(f"Submitting {len(texts_by_custom_id)} blocks from {len(chunks)} chunks to the Batch API...")
+        translations = await self.translator.translate_texts_via_batch_api(texts_by_custom_id)
+
+        all_rendered_pages: Dict[int, bytes] = {}
+        loop = asyncio.get_running_loop()
+        for chunk, merged_blocks in parsed:
+            translated_blocks: List[TranslatedBlock] = []
+            for m_block in merged_blocks:
+                translated_text = translations.get(f"{chunk.id}:{m_block.id}")
+                if translated_text:
+                    translated_blocks.append(TranslatedBlock(
+                        id=m_block.id,
+                        original_text=m_block.text,
+                        translated_text=translated_text,
+                        bbox=m_block.bbox,
+                        page_number=m_block.page_number
+                    ))
+
+            translated_by_page: Dict[int, List[TranslatedBlock]] = defaultdict(list)
+            for block in translated_blocks:
+                translated_by_page[block.page_number].append(block)
+            chunk_rendered_pages: Dict[int, bytes] = {}
+            pool = self.page_renderer._get_render_pool()
+            page_numbers = sorted(translated_by_page)
+            page_results = await asyncio.gather(*(
+                loop.run_in_executor(pool, _render_page,
+                                     pdf_path, page_num, translated_by_page[page_num])
+                for page_num in page_numbers))
+            for page_num, rendered_page_bytes in zip(page_numbers, page_results):
+                if rendered_page_bytes:
+                    chunk_rendered_pages[page_num] = rendered_page_bytes
+            if on_chunk_rendered is not None:
+                on_chunk_rendered(chunk_rendered_pages)
+            else:
+                all_rendered_pages.update(chunk_rendered_pages)
+            if progress_callback:
+                progress_callback(chunk)
+
+        return all_rendered_pages
@@ -1,16 +1,22 @@
 from azure.core.credentials import AzureKeyCredential
-from azure.ai.documentintelligence import DocumentIntelligenceClient
+from azure.ai.documentintelligence.aio import DocumentIntelligenceClient
 from azure.ai.documentintelligence.models import (
     AnalyzeResult, AnalyzeDocumentRequest,
     DocumentAnalysisFeature # Import features enum
 )
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+import numpy as np
 from ..models import Block, BoundingBox, Chunk
 from ..config import AZURE_DI_ENDPOINT, AZURE_DI_KEY
+import asyncio
 import fitz # PyMuPDF for extracting pages
-import io
-import time
-import uuid
+import hashlib
+import logging
+import itertools
+import orjson
+import os
+
+logger = logging.getLogger(__name__)
 
 class AzureDocumentParser:
     """Uses Azure Document Intelligence to extract text blocks and coordinates."""
@@ -18,110 +24,351 @@ class AzureDocumentParser:
     def __init__(self):
         if not AZURE_DI_ENDPOINT or not AZURE_DI_KEY:
             raise ValueError("Azure Document Intelligence endpoint or key is not configured.")
-        self.client = DocumentIntelligenceClient(endpoint=AZURE_DI_ENDPOINT, credential=AzureKeyCredential(AZURE_DI_KEY))
+        # The async client's aiohttp session binds to the loop it first runs
+        # on, and the GUI starts a fresh asyncio.run() loop per job — so the
+        # client is created per event loop (see _get_client), like the
+        # OpenAI client in config.py.
+        self._client: Optional[DocumentIntelligenceClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Cache for the document-level analysis, keyed by (path, mtime) so a
+        # modified file is automatically re-analyzed.
+        self._analyze_cache: Dict[Tuple[str, float], AnalyzeResult] = {}
+        # Documents whose whole-document analysis already failed, by the same
+        # (path, mtime) key. Remembering the failure keeps later chunks from
+        # re-reading, re-hashing, and re-uploading the file one at a time
+        # under the analyze lock before reaching the per-chunk fallback.
+        self._failed_analyses: set = set()
+        # Serializes the document-level call so concurrent chunks don't all
+        # fire their own whole-document analysis on a cache miss. Created
+        # per event loop (see _get_analyze_lock): every chunk contends on it
+        # immediately, which binds a Lock to the first run's loop, and the
+        # GUI starts a fresh asyncio.run() loop for each job.
+        self._analyze_lock: Optional[asyncio.Lock] = None
+        self._analyze_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+        # Re-analyses of the same page range (e.g. during layout iteration)
+        # reuse the extracted chunk bytes instead of rebuilding them. Keyed by
+        # (path, mtime, page range) and evicted whenever a different document
+        # comes through, mirroring the one-document cap on _analyze_cache.
+        self._temp_pdf_cache: Dict[Tuple[str, float, Tuple[int, int]], bytes] = {}
+        # Monotonic fallback for blocks without spans; cheaper than pulling
+        # 16 CSPRNG bytes per line via uuid4.
+        self._fallback_id_gen = itertools.count()
+        # On-disk AnalyzeResult cache: a hit replaces a 10-60s OCR round-trip
+        # with a local file read (useful while iterating on layout/rendering).
+        self._di_cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "translatepdf", "di")
+
+    def _get_client(self) -> DocumentIntelligenceClient:
+        """Returns the DI client for the current event loop."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = DocumentIntelligenceClient(
+                endpoint=AZURE_DI_ENDPOINT, credential=AzureKeyCredential(AZURE_DI_KEY))
+            self._client_loop = loop
+        return self._client
+
+    def _get_analyze_lock(self) -> asyncio.Lock:
+        """Returns the document-analysis lock for the current event loop."""
+        loop = asyncio.get_running_loop()
+        if self._analyze_lock is None or self._analyze_lock_loop is not loop:
+            self._analyze_lock = asyncio.Lock()
+            self._analyze_lock_loop = loop
+        return self._analyze_lock
+
+    async def analyze_document_once(self, pdf_path: str) -> AnalyzeResult:
+        """Analyzes the entire PDF with a single Document Intelligence call.
+
+        The result is cached keyed by (pdf_path, mtime) so subsequent chunks
+        reuse it instead of paying one Azure round-trip per chunk. A failure
+        is cached under the same key, so later chunks fail fast here and go
+        straight to the per-chunk fallback.
+
+        Args:
+            pdf_path: Path to the input PDF file.
+
+        Returns:
+            The AnalyzeResult covering every page of the document.
+        """
+        cache_key = (pdf_path, os.path.getmtime(pdf_path))
+        if cache_key in self._failed_analyses:
+            raise RuntimeError(f"Document-level analysis previously failed for '{pdf_path}'.")
+        async with self._get_analyze_lock():
+            cached = self._analyze_cache.get(cache_key)
+            if cached is not None:
+                return cached
+            # Re-check after waiting on the lock: the chunk that held it may
+            # have just recorded the failure.
+            if cache_key in self._failed_analyses:
+                raise RuntimeError(f"Document-level analysis previously failed for '{pdf_path}'.")
+
+            try:
+                with open(pdf_path, 'rb') as f:
+                    pdf_bytes = f.read()
+
+                pdf_hash = hashlib.blake2b(pdf_bytes, digest_size=16).hexdigest()
+                result = self._load_cached_result(pdf_hash)
+                if result is None:
+                    print(f"Sending entire document '{pdf_path}' to Document Intelligence (single call)...")
+                    poller = await self._get_client().begin_analyze_document(
+                        "prebuilt-read", # Use the "read" model for text extraction
+                        AnalyzeDocumentRequest(bytes_source=pdf_bytes),
+                        output_content_format="markdown",
+                        features=[DocumentAnalysisFeature.OCR_HIGH_RESOLUTION] # Request only basic OCR features
+                    )
+                    result = await poller.result()
+                    print(f"Document Intelligence analysis complete for '{pdf_path}' ({len(result.pages) if result.pages else 0} pages).")
+                    self._store_cached_result(pdf_hash, result)
+                else:
+                    print(f"Loaded cached Document Intelligence result for '{pdf_path}' (hash {pdf_hash}).")
+            except Exception:
+                self._failed_analyses.add(cache_key)
+                raise
 
-    def extract_blocks_for_chunk(self, pdf_path: str, chunk: Chunk) -> List[Block]:
+            # Keep at most one document's result live to bound memory.
+            self._analyze_cache.clear()
+            self._analyze_cache[cache_key] = result
+            return result
+
+    def _di_cache_path(self, pdf_hash: str) -> str:
+        return os.path.join(self._di_cache_dir, f"{pdf_hash}.json")
+
+    def _load_cached_result(self, pdf_hash: str) -> Optional[AnalyzeResult]:
+        """Returns the cached AnalyzeResult for the content hash, if any."""
+        cache_path = self._di_cache_path(pdf_hash)
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            # orjson parses these multi-megabyte payloads several times
+            # faster than the stdlib json module.
+            with open(cache_path, 'rb') as f:
+                return AnalyzeResult(orjson.loads(f.read()))
+        except Exception as e:
+            print(f"Warning: failed to load cached DI result '{cache_path}': {e}")
+            return None
+
+    def _store_cached_result(self, pdf_hash: str, result: AnalyzeResult):
+        """Persists an AnalyzeResult under the PDF's content hash."""
+        try:
+            os.makedirs(self._di_cache_dir, exist_ok=True)
+            with open(self._di_cache_path(pdf_hash), 'wb') as f:
+                f.write(orjson.dumps(result.as_dict()))
+        except Exception as e:
+            print(f"Warning: failed to cache DI result for hash {pdf_hash}: {e}")
+
+    async def extract_blocks_for_chunk(self, pdf_path: str, chunk: Chunk,
+                                       pdf_doc: Optional[fitz.Document] = None) -> List[Block]:
         """Extracts text blocks for the pages specified in the chunk.
 
         Args:
             pdf_path: Path to the original PDF file.
             chunk: The Chunk object defining the page range.
+            pdf_doc: Optionally, an already-open document for pdf_path, so the
+                fallback path does not have to re-parse the file.
 
         Returns:
             A list of Block objects extracted from the specified pages.
         """
         extracted_blocks: List[Block] = []
         start_page, end_page = chunk.page_numbers # 1-based
+
+        try:
+            # Fast path: one document-level analysis shared by all chunks.
+            # DI page numbers then match the original page numbers directly.
+            result = await self.analyze_document_once(pdf_path)
+            page_offset = 0
+        except Exception as e:
+            print(f"Document-level analysis failed ({e}). Falling back to per-chunk analysis for chunk {chunk.id}.")
+            result = await self._analyze_chunk(pdf_path, chunk, pdf_doc)
+            # DI page_number is 1-based within the submitted chunk document
+            page_offset = start_page - 1
+
+        if result is None:
+            print(f"Chunk {chunk.id}: Extracted 0 blocks.")
+            return []
+
+        # Prefer DI's aggregated paragraphs: roughly 10x fewer blocks than
+        # per-line extraction, which means less merge work and fewer
+        # translator round-trips. Fall back to lines when absent.
+        if result.paragraphs:
+            extracted_blocks = self._extract_from_paragraphs(result, page_offset, start_page, end_page)
+            print(f"Chunk {chunk.id}: Extracted {len(extracted_blocks)} paragraph blocks.")
+            return extracted_blocks
+
+        if result.pages:
+            for page_result in result.pages:
+                original_page_number = page_offset + page_result.page_number
+                if not (start_page <= original_page_number <= end_page):
+                    continue
+                logger.debug("  Processing DI page %d (Original page: %d). Found %d lines.",
+                             page_result.page_number, original_page_number,
+                             len(page_result.lines) if page_result.lines else 0)
+                if page_result.lines:
+                     # --- Simple block-per-line approach (Merge later) ---
+                     # You might want a more sophisticated approach based on paragraphs if available
+                    quad_lines = []     # the common case: 4-point polygons, vectorized below
+                    other_lines = []    # polygons with more points, handled individually
+                    for idx, line in enumerate(page_result.lines):
+                        # Use polygon instead of bounding_regions for stable versions
+                        if line.polygon and line.content:
+                            # Polygon is a flat list [x0, y0, x1, y1, ...]
+                            if len(line.polygon) == 8:
+                                quad_lines.append(line)
+                            elif len(line.polygon) > 8 and len(line.polygon) % 2 == 0:
+                                other_lines.append(line)
+                            elif logger.isEnabledFor(logging.DEBUG):
+                                logger.debug("    Line %d: Polygon found but has insufficient points (%d points). Skipping.",
+                                             idx, len(line.polygon))
+                        elif logger.isEnabledFor(logging.DEBUG):
+                            # Gate so the slicing/formatting work is skipped in production
+                            logger.debug("    Line %d: Skipping line - Missing polygon or content. Content: '%s', Polygon: %s",
+                                         idx, line.content[:30] if line.content else 'N/A',
+                                         'Exists' if line.polygon else 'Missing')
+
+                    if quad_lines:
+                        # One reshape + two axis reductions replace per-line
+                        # list comprehensions and four min/max calls each.
+                        polys = np.fromiter(
+                            (coord for line in quad_lines for coord in line.polygon),
+                            dtype=np.float32, count=len(quad_lines) * 8
+                        ).reshape(-1, 4, 2)
+                        mins = polys.min(axis=1)
+                        whs = polys.max(axis=1) - mins
+                        for line, line_min, line_wh in zip(quad_lines, mins, whs):
+                            extracted_blocks.append(self._make_block(
+                                line, original_page_number,
+                                float(line_min[0]), float(line_min[1]),
+                                float(line_wh[0]), float(line_wh[1])))
+
+                    for line in other_lines:
+                        poly = np.asarray(line.polygon, dtype=np.float32).reshape(-1, 2)
+                        line_min = poly.min(axis=0)
+                        line_wh = poly.max(axis=0) - line_min
+                        extracted_blocks.append(self._make_block(
+                            line, original_page_number,
+                            float(line_min[0]), float(line_min[1]),
+                            float(line_wh[0]), float(line_wh[1])))
+        else:
+             print(f"Chunk {chunk.id}: No pages found in Document Intelligence result.")
+
+        print(f"Chunk {chunk.id}: Extracted {len(extracted_blocks)} blocks.")
+        return extracted_blocks
+
+    def _extract_from_paragraphs(self, result: AnalyzeResult, page_offset: int,
+                                 start_page: int, end_page: int) -> List[Block]:
+        """Builds Blocks from DI paragraph objects within the page range."""
+        extracted_blocks: List[Block] = []
+        quad_paragraphs = []    # (paragraph, page_number), 4-point polygons
+        other_paragraphs = []   # polygons with more points
+
+        for paragraph in result.paragraphs:
+            if not (paragraph.content and paragraph.bounding_regions):
+                continue
+            region = paragraph.bounding_regions[0]
+            page_number = page_offset + region.page_number
+            if not (start_page <= page_number <= end_page):
+                continue
+            polygon = region.polygon
+            if polygon and len(polygon) == 8:
+                quad_paragraphs.append((paragraph, page_number))
+            elif polygon and len(polygon) > 8 and len(polygon) % 2 == 0:
+                other_paragraphs.append((paragraph, page_number))
+
+        if quad_paragraphs:
+            polys = np.fromiter(
+                (coord for paragraph, _ in quad_paragraphs
+                 for coord in paragraph.bounding_regions[0].polygon),
+                dtype=np.float32, count=len(quad_paragraphs) * 8
+            ).reshape(-1, 4, 2)
+            mins = polys.min(axis=1)
+            whs = polys.max(axis=1) - mins
+            for (paragraph, page_number), p_min, p_wh in zip(quad_paragraphs, mins, whs):
+                extracted_blocks.append(self._make_block(
+                    paragraph, page_number,
+                    float(p_min[0]), float(p_min[1]),
+                    float(p_wh[0]), float(p_wh[1])))
+
+        for paragraph, page_number in other_paragraphs:
+            poly = np.asarray(paragraph.bounding_regions[0].polygon, dtype=np.float32).reshape(-1, 2)
+            p_min = poly.min(axis=0)
+            p_wh = poly.max(axis=0) - p_min
+            extracted_blocks.append(self._make_block(
+                paragraph, page_number,
+                float(p_min[0]), float(p_min[1]),
+                float(p_wh[0]), float(p_wh[1])))
+
+        return extracted_blocks
+
+    def _make_block(self, line, original_page_number: int,
+                    x: float, y: float, width: float, height: float) -> Block:
+        """Builds a Block for a DI line/paragraph from precomputed bbox components."""
+        suffix = line.spans[0].offset if line.spans else f"x{next(self._fallback_id_gen):x}"
+        block_id = f"p{original_page_number}_l{suffix}"
+        return Block(
+            id=block_id,
+            text=line.content.strip(),
+            bbox=BoundingBox(x=x, y=y, width=width, height=height),
+            page_number=original_page_number
+        )
+
+    async def _analyze_chunk(self, pdf_path: str, chunk: Chunk,
+                             pdf_doc: Optional[fitz.Document] = None) -> Optional[AnalyzeResult]:
+        """Fallback: analyzes only the chunk's pages via a temporary PDF."""
+        start_page, end_page = chunk.page_numbers
         page_indices = list(range(start_page - 1, end_page)) # 0-based indices for PyMuPDF
 
         try:
-            doc = fitz.open(pdf_path)
             if not page_indices:
                 print(f"Chunk {chunk.id}: No pages to process.")
-                return []
+                return None
 
-            # Create a temporary in-memory PDF with only the pages for this chunk
-            temp_pdf_bytes = self._create_temp_pdf_for_chunk(doc, page_indices)
-            doc.close()
+            # Create a temporary in-memory PDF with only the pages for this
+            # chunk, reusing the shared document handle when available.
+            cache_key = (pdf_path, os.path.getmtime(pdf_path),
+                         (page_indices[0], page_indices[-1]))
+            temp_pdf_bytes = self._temp_pdf_cache.get(cache_key)
+            if temp_pdf_bytes is None:
+                if pdf_doc is not None:
+                    temp_pdf_bytes = self._create_temp_pdf_for_chunk(pdf_doc, page_indices)
+                else:
+                    doc = fitz.open(pdf_path)
+                    temp_pdf_bytes = self._create_temp_pdf_for_chunk(doc, page_indices)
+                    doc.close()
+                if temp_pdf_bytes:
+                    # Keep chunk bytes for one document at a time: drop
+                    # entries from any other file (or an older mtime) so the
+                    # cache can't grow across documents.
+                    for key in [k for k in self._temp_pdf_cache if k[:2] != cache_key[:2]]:
+                        del self._temp_pdf_cache[key]
+                    self._temp_pdf_cache[cache_key] = temp_pdf_bytes
 
             if not temp_pdf_bytes:
                 print(f"Chunk {chunk.id}: Failed to create temporary PDF for analysis.")
-                return []
+                return None
 
             print(f"Chunk {chunk.id}: Sending pages {start_page}-{end_page} to Document Intelligence...")
-            # Use Read model (formerly Layout)
-            poller = self.client.begin_analyze_document(
-                "prebuilt-read", # Use the "read" model for text extraction
+            poller = await self._get_client().begin_analyze_document(
+                "prebuilt-read",
                 AnalyzeDocumentRequest(bytes_source=temp_pdf_bytes),
                 output_content_format="markdown",
-                features=[DocumentAnalysisFeature.OCR_HIGH_RESOLUTION] # Request only basic OCR features
+                features=[DocumentAnalysisFeature.OCR_HIGH_RESOLUTION]
             )
-            result: AnalyzeResult = poller.result()
+            result: AnalyzeResult = await poller.result()
             print(f"Chunk {chunk.id}: Document Intelligence analysis complete.")
-
-            if result.pages:
-                print(f"Chunk {chunk.id}: Processing {len(result.pages)} pages from DI result...")
-                for page_result in result.pages:
-                    original_page_number = start_page + page_result.page_number - 1 # DI page_number is 1-based within the submitted doc
-                    print(f"  Processing DI page {page_result.page_number} (Original page: {original_page_number}). Found {len(page_result.lines) if page_result.lines else 0} lines.")
-                    if page_result.lines:
-                         # --- Simple block-per-line approach (Merge later) ---
-                         # You might want a more sophisticated approach based on paragraphs if available
-                        for idx, line in enumerate(page_result.lines):
-                            # Use polygon instead of bounding_regions for stable versions
-                            if line.polygon and line.content:
-                                print(f"    Line {idx}: Content='{line.content[:30]}...' Polygon found.")
-                                # DI gives polygon (points), calculate simple bbox
-                                # Polygon is a flat list [x0, y0, x1, y1, ...]
-                                if len(line.polygon) >= 8: # Ensure at least 4 points (quadrilateral)
-                                    x_coords = [line.polygon[i] for i in range(0, len(line.polygon), 2)]
-                                    y_coords = [line.polygon[i] for i in range(1, len(line.polygon), 2)]
-                                    
-                                    min_x = min(x_coords)
-                                    min_y = min(y_coords)
-                                    max_x = max(x_coords)
-                                    max_y = max(y_coords)
-                                    
-                                    bbox = BoundingBox(
-                                        x=min_x,
-                                        y=min_y,
-                                        width=max_x - min_x,
-                                        height=max_y - min_y
-                                    )
-                                    block_id = f"p{original_page_number}_l{line.spans[0].offset if line.spans else uuid.uuid4()}"
-                                    block = Block(
-                                        id=block_id,
-                                        text=line.content.strip(),
-                                        bbox=bbox,
-                                        page_number=original_page_number
-                                    )
-                                    extracted_blocks.append(block)
-                                    # print(f"      Created Block ID: {block_id}, BBox: ({bbox.x:.2f},{bbox.y:.2f}, w:{bbox.width:.2f}, h:{bbox.height:.2f})")
-                                else:
-                                     print(f"    Line {idx}: Polygon found but has insufficient points ({len(line.polygon)} points). Skipping.")
-
-                            else:
-                                print(f"    Line {idx}: Skipping line - Missing polygon or content. Content: '{line.content[:30] if line.content else 'N/A'}', Polygon: {'Exists' if line.polygon else 'Missing'}")
-            else:
-                 print(f"Chunk {chunk.id}: No pages found in Document Intelligence result.")
-
-
+            return result
         except Exception as e:
             print(f"Error during Document Intelligence processing for chunk {chunk.id} (Pages {start_page}-{end_page}): {e}")
             # Consider retry logic or specific error handling
-
-        print(f"Chunk {chunk.id}: Extracted {len(extracted_blocks)} blocks.")
-        return extracted_blocks
+            return None
 
     def _create_temp_pdf_for_chunk(self, original_doc: fitz.Document, page_indices: List[int]) -> bytes | None:
         """Creates an in-memory PDF containing only the specified pages."""
         try:
             temp_doc = fitz.open() # Create a new empty PDF
             temp_doc.insert_pdf(original_doc, from_page=min(page_indices), to_page=max(page_indices), show_progress=0)
-            # Save to memory
-            pdf_bytes = temp_doc.tobytes(garbage=4, deflate=True)
+            # Save to memory. The bytes are uploaded to Azure and re-parsed
+            # there immediately, so skip the full object GC and zlib pass.
+            pdf_bytes = temp_doc.tobytes(garbage=0, deflate=False, clean=False)
             temp_doc.close()
             return pdf_bytes
         except Exception as e:
             print(f"Error creating temporary PDF for pages {min(page_indices)+1}-{max(page_indices)+1}: {e}")
-            return None 
\ No newline at end of file
+            return None
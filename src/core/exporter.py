@@ -1,10 +1,81 @@
 import fitz # PyMuPDF
-from typing import Dict
+from typing import Dict, List, Optional
 import os
+import threading
 
 class Exporter:
     """Combines rendered pages and saves the final PDF."""
 
+    def __init__(self):
+        self._final_doc: Optional[fitz.Document] = None
+        self._page_order: List[int] = []  # original page numbers in insertion order
+        self._output_path: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def open(self, output_path: str):
+        """Starts an incremental export to output_path."""
+        with self._lock:
+            if self._final_doc is not None:
+                self._final_doc.close()
+            self._final_doc = fitz.open()
+            self._page_order = []
+            self._output_path = output_path
+
+    def append_pages(self, rendered_pages: Dict[int, bytes]):
+        """Inserts a chunk's rendered pages as soon as they are produced.
+
+        Pages may arrive out of order across chunks; close() restores the
+        document order. The per-page bytes can be garbage collected right
+        after this call instead of living until the end of the run.
+        """
+        with self._lock:
+            if self._final_doc is None:
+                raise RuntimeError("Exporter.open() must be called before append_pages().")
+            for page_num in sorted(rendered_pages):
+                try:
+                    page_doc = fitz.open("pdf", rendered_pages[page_num])
+                    self._final_doc.insert_pdf(page_doc, links=False, annots=False)
+                    page_doc.close()
+                    self._page_order.append(page_num)
+                except Exception as e:
+                    print(f"Error inserting page {page_num} into final PDF: {e}. Skipping this page.")
+
+    def close(self, total_pages: int) -> int:
+        """Reorders, saves and closes the incremental export.
+
+        Returns:
+            The number of pages written to the output file.
+        """
+        with self._lock:
+            if self._final_doc is None:
+                return 0
+            added_pages_count = len(self._page_order)
+            try:
+                if added_pages_count > 0:
+                    # Restore original page order (chunks may finish out of order).
+                    order = sorted(range(added_pages_count), key=lambda i: self._page_order[i])
+                    self._final_doc.select(order)
+                    if added_pages_count < total_pages:
+                        print(f"Warning: {total_pages - added_pages_count} pages were not rendered and are missing from the output.")
+                    os.makedirs(os.path.dirname(self._output_path), exist_ok=True)
+                    self._final_doc.save(self._output_path, garbage=4, deflate=True, clean=True, linear=False)
+                    print(f"Successfully saved translated PDF ({added_pages_count}/{total_pages} pages) to: {self._output_path}")
+                else:
+                    print("No pages were successfully rendered or added. Final PDF not saved.")
+            finally:
+                self._final_doc.close()
+                self._final_doc = None
+                self._page_order = []
+            return added_pages_count
+
+    def discard(self):
+        """Drops an in-progress incremental export (e.g. after an error)."""
+        with self._lock:
+            if self._final_doc is not None:
+                self._final_doc.close()
+                self._final_doc = None
+                self._page_order = []
+
     def save_pdf(self, rendered_pages: Dict[int, bytes], total_pages: int, output_path: str):
         """Combines rendered page bytes into a single PDF file.
 
@@ -23,7 +94,9 @@ class Exporter:
             if page_bytes:
                 try:
                     page_doc = fitz.open("pdf", page_bytes) # Load page bytes into a temp doc
-                    final_doc.insert_pdf(page_doc) # Insert the page into the final doc
+                    # links/annots are never produced by the overlay step, so
+                    # skip the expensive cross-reference rewrites for them.
+                    final_doc.insert_pdf(page_doc, links=False, annots=False)
                     page_doc.close()
                     added_pages_count += 1
                 except Exception as e:
@@ -36,7 +109,9 @@ class Exporter:
             try:
                 # Ensure output directory exists
                 os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                final_doc.save(output_path, garbage=4, deflate=True)
+                # Garbage-collect and compress once at the end instead of per
+                # insertion; clean=True sanitizes the merged content streams.
+                final_doc.save(output_path, garbage=4, deflate=True, clean=True, linear=False)
                 print(f"Successfully saved translated PDF ({added_pages_count}/{total_pages} pages) to: {output_path}")
             except Exception as e:
                 print(f"Error saving final PDF to '{output_path}': {e}")
@@ -1,13 +1,77 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import fitz # PyMuPDF
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from ..models import TranslatedBlock
 from .layout_engine import LayoutEngine
 
+# --- Render worker process support ---
+# Page overlay work (canvas build, font shaping, redactions) is CPU-bound
+# and independent per page, so pages render in worker processes. Each worker
+# builds its own LayoutEngine once in the initializer (fonts register once
+# per process) and reuses it; only pickle-cheap arguments cross the process
+# boundary (pdf path, page number, translated blocks).
+_worker_layout_engine: Optional[LayoutEngine] = None
+# Source documents stay open per worker so rendering N pages of the same
+# file costs one parse + xref load per worker instead of one per page. At
+# most one document is kept live at a time to bound memory. Keyed by
+# (path, mtime): pools outlive a run, so a file overwritten at the same
+# path must be reopened, not served from the previous run's handle.
+_worker_doc_cache: Dict[Tuple[str, float], fitz.Document] = {}
+
+def _init_render_worker(font_name: str, font_path: str, font_size: int):
+    """Builds the per-process LayoutEngine (registers fonts once per worker)."""
+    global _worker_layout_engine
+    _worker_layout_engine = LayoutEngine(
+        font_name=font_name, font_path=font_path, default_font_size=font_size)
+
+def _get_worker_doc(pdf_path: str) -> fitz.Document:
+    """Returns the worker's open handle for pdf_path, opening it on first use."""
+    cache_key = (pdf_path, os.path.getmtime(pdf_path))
+    doc = _worker_doc_cache.get(cache_key)
+    if doc is None:
+        for old_doc in _worker_doc_cache.values():
+            old_doc.close()
+        _worker_doc_cache.clear()
+        doc = fitz.open(pdf_path)
+        _worker_doc_cache[cache_key] = doc
+    return doc
+
+def _render_page(pdf_path: str, page_num: int,
+                 translated_blocks: List[TranslatedBlock]) -> Optional[bytes]:
+    """Renders one page in a worker process via the process-local engine."""
+    try:
+        return _worker_layout_engine.overlay_text_on_page_doc(
+            _get_worker_doc(pdf_path), page_num, translated_blocks)
+    finally:
+        # MuPDF keeps decoded resources (images, fonts) in a global store
+        # that otherwise grows for as long as the worker lives; empty it
+        # after each page so worker memory stays flat.
+        fitz.TOOLS.store_shrink(100)
+
 class PageRenderer:
     """Renders individual PDF pages with translated text overlaid."""
 
     def __init__(self, layout_engine: LayoutEngine):
         self.layout_engine = layout_engine
+        self._render_pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_render_pool(self) -> ProcessPoolExecutor:
+        """Lazily creates the rendering process pool for this renderer."""
+        if self._render_pool is None:
+            self._render_pool = ProcessPoolExecutor(
+                max_workers=os.cpu_count(),
+                initializer=_init_render_worker,
+                initargs=(self.layout_engine.font_name,
+                          self.layout_engine.font_path,
+                          self.layout_engine.default_font_size))
+        return self._render_pool
+
+    def shutdown(self):
+        """Tears down the rendering process pool (safe to call repeatedly)."""
+        if self._render_pool is not None:
+            self._render_pool.shutdown()
+            self._render_pool = None
 
     def render_pages_for_chunk(self, original_pdf_path: str, 
                                page_numbers: List[int], 
@@ -24,16 +88,36 @@ class PageRenderer:
         """
         rendered_pages: Dict[int, bytes] = {}
 
-        for page_num in page_numbers:
-            blocks_for_page = translated_blocks_by_page.get(page_num, [])
-            print(f"Rendering page {page_num} with {len(blocks_for_page)} translated blocks...")
-            
-            rendered_page_bytes = self.layout_engine.overlay_text_on_page(
-                original_pdf_path=original_pdf_path,
-                page_num=page_num,
-                translated_blocks=blocks_for_page
-            )
-            
+        # Pages with no translated blocks would render to an exact copy of
+        # the original; lift their raw bytes straight out of the source PDF
+        # and skip the overlay machinery entirely.
+        pages_with_blocks = [p for p in page_numbers if translated_blocks_by_page.get(p)]
+        empty_pages = [p for p in page_numbers if not translated_blocks_by_page.get(p)]
+        if empty_pages:
+            with fitz.open(original_pdf_path) as doc:
+                for page_num in empty_pages:
+                    page_bytes = self._get_original_page_bytes(original_pdf_path, page_num, doc)
+                    if page_bytes:
+                        rendered_pages[page_num] = page_bytes
+                        print(f"Page {page_num} has no translated blocks; copied original page.")
+
+        # Pages are independent CPU-bound jobs: submit them all to the worker
+        # pool and collect as they finish, for a near-linear speedup up to
+        # min(num_pages, cpu_count).
+        pool = self._get_render_pool()
+        futures = {
+            pool.submit(_render_page, original_pdf_path, page_num,
+                        translated_blocks_by_page[page_num]): page_num
+            for page_num in pages_with_blocks
+        }
+        for future in as_completed(futures):
+            page_num = futures[future]
+            try:
+                rendered_page_bytes = future.result()
+            except Exception as e:
+                print(f"Error rendering page {page_num} in worker: {e}")
+                rendered_page_bytes = None
+
             if rendered_page_bytes:
                 rendered_pages[page_num] = rendered_page_bytes
                 print(f"Page {page_num} rendered successfully.")
@@ -44,22 +128,28 @@ class PageRenderer:
 
         return rendered_pages
 
-    def _get_original_page_bytes(self, pdf_path: str, page_num: int) -> Optional[bytes]:
-        """Helper to get the raw bytes of an original page."""
+    def _get_original_page_bytes(self, pdf_path: str, page_num: int,
+                                 doc: Optional[fitz.Document] = None) -> Optional[bytes]:
+        """Helper to get the raw bytes of an original page.
+
+        Pass an already-open doc to avoid re-parsing the file per page; it is
+        left open for the caller.
+        """
+        owns_doc = doc is None
         try:
-            doc = fitz.open(pdf_path)
+            if doc is None:
+                doc = fitz.open(pdf_path)
             if 0 < page_num <= len(doc):
-                page = doc.load_page(page_num - 1)
                 # Create a new single-page doc to save bytes correctly
                 temp_doc = fitz.open()
                 temp_doc.insert_pdf(doc, from_page=page_num-1, to_page=page_num-1)
                 page_bytes = temp_doc.tobytes()
                 temp_doc.close()
-                doc.close()
                 return page_bytes
-            else:
-                doc.close()
-                return None
+            return None
         except Exception as e:
             print(f"Error getting original page {page_num} bytes: {e}")
-            return None 
\ No newline at end of file
+            return None
+        finally:
+            if owns_doc and doc is not None:
+                doc.close() 
\ No newline at end of file
@@ -1,5 +1,6 @@
 import fitz # PyMuPDF
-from typing import List, Tuple
+import numpy as np
+from typing import List, Optional, Tuple
 from ..models import Chunk
 import math
 
@@ -9,11 +10,15 @@ class PDFLoader:
     def __init__(self, chunk_size: int = 10):
         self.chunk_size = chunk_size
 
-    def load_and_split(self, pdf_path: str) -> Tuple[List[Chunk], int]:
+    def load_and_split(self, pdf_path: str,
+                       pdf_doc: Optional[fitz.Document] = None) -> Tuple[List[Chunk], int]:
         """Loads the PDF, determines the total pages, and creates chunks.
 
         Args:
             pdf_path: Path to the input PDF file.
+            pdf_doc: Optionally, an already-open fitz.Document for pdf_path;
+                passing it avoids parsing the file a second time just to
+                count pages. It is left open for the caller.
 
         Returns:
             A tuple containing:
@@ -22,20 +27,22 @@ class PDFLoader:
         """
         chunks = []
         try:
-            doc = fitz.open(pdf_path)
-            total_pages = len(doc)
-            doc.close()
+            if pdf_doc is not None:
+                total_pages = len(pdf_doc)
+            else:
+                with fitz.open(pdf_path) as doc:
+                    total_pages = len(doc)
 
             if total_pages == 0:
                 return [], 0
 
             num_chunks = math.ceil(total_pages / self.chunk_size)
 
-            for i in range(num_chunks):
-                start_page = i * self.chunk_size + 1
-                end_page = min((i + 1) * self.chunk_size, total_pages)
-                chunk = Chunk(id=i, page_numbers=(start_page, end_page))
-                chunks.append(chunk)
+            # Compute every chunk boundary in one vectorized pass.
+            starts = np.arange(num_chunks) * self.chunk_size + 1
+            ends = np.minimum(starts + self.chunk_size - 1, total_pages)
+            chunks = [Chunk(id=i, page_numbers=(int(s), int(e)))
+                      for i, (s, e) in enumerate(zip(starts, ends))]
 
             print(f"Loaded '{pdf_path}', {total_pages} pages, split into {num_chunks} chunks.")
             return chunks, total_pages
@@ -1,4 +1,6 @@
-from typing import List, Tuple
+from collections import defaultdict
+from typing import Dict, List, Tuple
+import numpy as np
 from ..models import Block, MergedBlock, BoundingBox
 import re
 
@@ -6,12 +8,28 @@ import re
 VERTICAL_TOLERANCE_FACTOR = 0.5 # Allowable vertical gap relative to block height
 HORIZONTAL_OVERLAP_THRESHOLD = 0.1 # Minimum horizontal overlap required
 
+# Precompiled once at import; _preprocess_text runs per block, so even the
+# re-module cache lookup is worth skipping.
+_WS_RE = re.compile(r'\s+')
+# Trailing hyphen preceded by a letter, i.e. a line-break word split.
+_TRAIL_HYPHEN_RE = re.compile(r'(?<=[A-Za-z])-\s*$')
+
+# Up to this many blocks per page the full upper-triangle pair set is cheap;
+# beyond it, pairs are generated from a spatial grid instead of all K*(K-1)/2.
+_DENSE_PAGE_THRESHOLD = 64
+
 class TextBlockMerger:
     """Merges individual text blocks into more coherent units (e.g., paragraphs)."""
 
     def merge_blocks(self, blocks: List[Block]) -> List[MergedBlock]:
         """Merges blocks based on proximity, page number, etc.
 
+        Blocks are grouped per page; within a page the pairwise gap geometry
+        is computed with NumPy broadcasting and connected groups are formed
+        with a union-find over the close pairs, so the Python-level work is
+        proportional to the number of adjacent pairs rather than K² attribute
+        lookups.
+
         Args:
             blocks: A list of Block objects, typically from a single page.
 
@@ -21,133 +39,155 @@ class TextBlockMerger:
         if not blocks:
             return []
 
-        # Sort blocks primarily by top coordinate (y), then left coordinate (x)
-        blocks.sort(key=lambda b: (b.bbox.y, b.bbox.x))
+        blocks_by_page: Dict[int, List[Block]] = defaultdict(list)
+        for block in blocks:
+            blocks_by_page[block.page_number].append(block)
 
         merged: List[MergedBlock] = []
-        current_merged_text = ""
-        current_original_ids: List[str] = []
-        current_page_number = -1
-        last_block: Block | None = None
-
-        for i, block in enumerate(blocks):
-            if not last_block: # First block
-                current_merged_text = self._preprocess_text(block.text)
-                current_original_ids = [block.id]
-                current_page_number = block.page_number
-                last_block = block
-            elif self._should_merge(last_block, block):
-                # Check for hyphenated word at the end of the last block's text
-                processed_last_text = self._handle_hyphenation(last_block.text)
-                
-                # Append preprocessed text
-                current_merged_text += (" " + self._preprocess_text(block.text) if not processed_last_text.endswith('-') else self._preprocess_text(block.text))
-                current_original_ids.append(block.id)
-                # Update last_block for next comparison (bbox doesn't need update for logic)
-                last_block = block
-            else: # Start a new merged block
-                # Save the previous merged block
-                merged.append(MergedBlock(
-                    id=f"merged_{current_original_ids[0]}",
-                    text=current_merged_text.strip(),
-                    original_block_ids=current_original_ids,
-                    page_number=current_page_number
-                    # TODO: Optionally calculate union Bbox here
-                ))
-                # Reset for the new block
-                current_merged_text = self._preprocess_text(block.text)
-                current_original_ids = [block.id]
-                current_page_number = block.page_number
-                last_block = block
-
-        # Add the last processed merged block
-        if current_original_ids:
-            merged.append(MergedBlock(
-                id=f"merged_{current_original_ids[0]}",
-                text=current_merged_text.strip(),
-                original_block_ids=current_original_ids,
-                page_number=current_page_number
-            ))
+        for page_number in sorted(blocks_by_page):
+            merged.extend(self._merge_page(blocks_by_page[page_number]))
 
         print(f"Processed {len(blocks)} blocks into {len(merged)} merged blocks.")
         return merged
 
-    def _should_merge(self, block1: Block, block2: Block) -> bool:
-        """Determines if two blocks should be merged based on spatial proximity."""
-        # Must be on the same page
-        if block1.page_number != block2.page_number:
-            return False
-
-        b1_bottom = block1.bbox.y + block1.bbox.height
-        b2_top = block2.bbox.y
-        vertical_gap = b2_top - b1_bottom
+    def _merge_page(self, blocks: List[Block]) -> List[MergedBlock]:
+        """Merges the blocks of a single page via adjacency + union-find."""
+        if len(blocks) == 1:
+            block = blocks[0]
+            return [MergedBlock(
+                id=f"merged_{block.id}",
+                text=self._preprocess_text(block.text),
+                original_block_ids=[block.id],
+                page_number=block.page_number,
+                bbox=block.bbox
+            )]
+
+        coords = np.array(
+            [(b.bbox.x, b.bbox.y, b.bbox.width, b.bbox.height) for b in blocks],
+            dtype=np.float32)
+        x, y, w, h = coords.T
+        x2 = x + w
+        y2 = y + h
+
+        # Only spatially close pairs can merge; the candidate set is the full
+        # upper triangle for small pages and grid-binned neighbors otherwise.
+        ci, cj = self._candidate_pairs(x, y, x2, y2, h)
+
+        # Axis gaps per candidate pair: 0 where the boxes overlap.
+        dh = np.maximum(0, np.maximum(x[ci] - x2[cj], x[cj] - x2[ci]))
+        dv = np.maximum(0, np.maximum(y[ci] - y2[cj], y[cj] - y2[ci]))
+        avg_h = (h[ci] + h[cj]) * 0.5
+
+        vertically_close = dv < avg_h * VERTICAL_TOLERANCE_FACTOR
+
+        h_overlap = np.maximum(0, np.minimum(x2[ci], x2[cj]) - np.maximum(x[ci], x[cj]))
+        min_w = np.minimum(w[ci], w[cj])
+        horizontally_aligned = (h_overlap >= min_w * HORIZONTAL_OVERLAP_THRESHOLD) \
+            | (np.abs(x[ci] - x[cj]) <= avg_h * 0.5)
+
+        merge_mask = vertically_close & horizontally_aligned & (dh <= avg_h * 0.5)
+
+        # Don't merge across a sentence boundary: if the upper block of a pair
+        # ends with sentence punctuation, the lower one starts its own group.
+        ends_sentence = np.array(
+            [b.text.strip().endswith(('.', '!', '?')) for b in blocks], dtype=bool)
+        upper_terminal = np.where(y[ci] <= y[cj], ends_sentence[ci], ends_sentence[cj])
+        merge_mask &= ~upper_terminal
+
+        # Union-find over the surviving pairs.
+        parent = list(range(len(blocks)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i, j in zip(ci[merge_mask], cj[merge_mask]):
+            root_i, root_j = find(int(i)), find(int(j))
+            if root_i != root_j:
+                parent[root_j] = root_i
+
+        components: Dict[int, List[int]] = defaultdict(list)
+        for idx in range(len(blocks)):
+            components[find(idx)].append(idx)
 
-        # Check vertical proximity (allow small gap or minor overlap)
-        # Use average height for tolerance calculation
-        avg_height = (block1.bbox.height + block2.bbox.height) / 2
-        if not (-avg_height * 0.1 < vertical_gap < avg_height * VERTICAL_TOLERANCE_FACTOR):
-             return False
-
-        # Check horizontal overlap or close alignment
-        b1_left, b1_right = block1.bbox.x, block1.bbox.x + block1.bbox.width
-        b2_left, b2_right = block2.bbox.x, block2.bbox.x + block2.bbox.width
-        
-        overlap_start = max(b1_left, b2_left)
-        overlap_end = min(b1_right, b2_right)
-        horizontal_overlap = max(0, overlap_end - overlap_start)
-
-        # Require some horizontal overlap or very close horizontal start points
-        min_width = min(block1.bbox.width, block2.bbox.width)
-        if horizontal_overlap < min_width * HORIZONTAL_OVERLAP_THRESHOLD and abs(b1_left - b2_left) > avg_height * 0.5: # Allow some horizontal shift based on line height
-             return False
-
-        # Simple check: merge if text doesn't end with sentence-ending punctuation.
-        # More sophisticated checks (e.g., indentation) could be added.
-        if block1.text.strip().endswith(('.', '!', '?')):
-            return False
-
-        return True
+        merged: List[MergedBlock] = []
+        # Emit components in reading order of their topmost block.
+        for indices in sorted(components.values(),
+                              key=lambda idxs: (float(y[idxs].min()), float(x[idxs].min()))):
+            # Order blocks inside a component top-to-bottom, left-to-right.
+            indices.sort(key=lambda i: (float(y[i]), float(x[i])))
+            component_blocks = [blocks[i] for i in indices]
+            merged.append(MergedBlock(
+                id=f"merged_{component_blocks[0].id}",
+                text=" ".join(self._preprocess_text(b.text) for b in component_blocks).strip(),
+                original_block_ids=[b.id for b in component_blocks],
+                page_number=component_blocks[0].page_number,
+                bbox=self._union_bbox_soa(x, y, x2, y2, indices)
+            ))
+        return merged
 
+    @staticmethod
+    def _union_bbox_soa(x: np.ndarray, y: np.ndarray, x2: np.ndarray,
+                        y2: np.ndarray, indices: List[int]) -> BoundingBox:
+        """Union bounding box of the indexed blocks, one reduction per edge."""
+        min_x = float(x[indices].min())
+        min_y = float(y[indices].min())
+        return BoundingBox(
+            x=min_x,
+            y=min_y,
+            width=float(x2[indices].max()) - min_x,
+            height=float(y2[indices].max()) - min_y)
+
+    def _candidate_pairs(self, x: np.ndarray, y: np.ndarray, x2: np.ndarray,
+                         y2: np.ndarray, h: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns index arrays (i, j), i < j, of spatially close block pairs.
+
+        On dense pages a loose uniform grid replaces the all-pairs set: each
+        block is registered in every cell its padded bbox touches, and only
+        blocks sharing a cell become candidates. The pad covers the largest
+        gap the merge predicate can accept (0.5 * max height on both axes),
+        so no mergeable pair is ever skipped.
+        """
+        count = len(x)
+        if count <= _DENSE_PAGE_THRESHOLD:
+            return np.triu_indices(count, k=1)
+
+        pad = max(VERTICAL_TOLERANCE_FACTOR, 0.5) * float(h.max())
+        cell = max(pad * 2.0, 1e-6)
+        ix0 = np.floor((x - pad) / cell).astype(np.int64)
+        iy0 = np.floor((y - pad) / cell).astype(np.int64)
+        ix1 = np.floor((x2 + pad) / cell).astype(np.int64)
+        iy1 = np.floor((y2 + pad) / cell).astype(np.int64)
+
+        cells: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for idx in range(count):
+            for cx in range(ix0[idx], ix1[idx] + 1):
+                for cy in range(iy0[idx], iy1[idx] + 1):
+                    cells[(cx, cy)].append(idx)
+
+        # Blocks spanning several cells appear in each; the set dedupes.
+        pairs = set()
+        for members in cells.values():
+            for a in range(len(members) - 1):
+                for b in range(a + 1, len(members)):
+                    pairs.add((members[a], members[b]))
+        if not pairs:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty
+        pair_arr = np.array(sorted(pairs), dtype=np.int64)
+        return pair_arr[:, 0], pair_arr[:, 1]
 
     def _handle_hyphenation(self, text: str) -> str:
          """Removes trailing hyphen if it seems to be for word splitting."""
-         clean_text = text.strip()
-         # Simple check: remove hyphen if it's at the end and preceded by a letter
-         if clean_text.endswith('-') and len(clean_text) > 1 and clean_text[-2].isalpha():
-              # Check if the part before hyphen is likely a word fragment (optional, more complex)
-              return clean_text[:-1] # Remove hyphen
-         return clean_text # Return original cleaned text
+         return _TRAIL_HYPHEN_RE.sub('', text.strip())
 
     def _preprocess_text(self, text: str) -> str:
         """Basic text preprocessing."""
         # Remove trailing hyphens potentially used for word splitting across lines
         processed_text = self._handle_hyphenation(text)
         # Normalize whitespace (replace multiple spaces/newlines with single space)
-        processed_text = re.sub(r'\s+', ' ', processed_text).strip()
+        processed_text = _WS_RE.sub(' ', processed_text).strip()
         return processed_text
 
-    def _calculate_union_bbox(self, blocks: List[Block]) -> BoundingBox:
-        """Calculates the bounding box enclosing all given blocks."""
-        if not blocks:
-            # Should not happen if called correctly
-            return BoundingBox(x=0, y=0, width=0, height=0)
-
-        min_x = min(b.bbox.x for b in blocks)
-        min_y = min(b.bbox.y for b in blocks)
-        max_right = max(b.bbox.x + b.bbox.width for b in blocks)
-        max_bottom = max(b.bbox.y + b.bbox.height for b in blocks)
-
-        return BoundingBox(
-            x=min_x,
-            y=min_y,
-            width=max_right - min_x,
-            height=max_bottom - min_y
-        )
-
-    # --- Potential helper methods for actual merging ---
-    # def _is_vertically_close(block1: Block, block2: Block) -> bool:
-    #     ...
-    # def _is_horizontally_aligned(block1: Block, block2: Block) -> bool:
-    #     ...
-    # def _calculate_union_bbox(blocks: List[Block]) -> BoundingBox:
-    #     ... 
\ No newline at end of file
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import re
+import sqlite3
+import time
+from typing import Optional
+
+# Cached entries older than this are treated as misses and overwritten.
+CACHE_EXPIRY_SECONDS = 30 * 86400
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """Normalizes source text for cache keying (collapse whitespace runs)."""
+    return _WHITESPACE_RE.sub(" ", text).strip()
+
+class TranslationCache:
+    """Persistent translation memory backed by SQLite.
+
+    Keys are derived from (target language, model, normalized source text) so
+    repeated boilerplate (running heads, captions, legal text) and re-runs of
+    the same document skip the LLM call entirely.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        cache_dir = cache_dir or os.path.join(os.path.expanduser("~"), ".cache", "translatepdf")
+        os.makedirs(cache_dir, exist_ok=True)
+        self.db_path = os.path.join(cache_dir, "translations.db")
+        # The pipeline touches the cache from the event-loop thread and from
+        # executor threads, so do not bind the connection to one thread.
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY,"
+            " translation TEXT NOT NULL,"
+            " created REAL NOT NULL)"
+        )
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(text: str, target_lang: str, model: str) -> str:
+        """Builds the cache key for a source text."""
+        normalized = normalize_text(text)
+        payload = f"{target_lang}|{model}|{normalized}".encode("utf-8")
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached translation for the key, or None on miss/expiry."""
+        try:
+            row = self.conn.execute(
+                "SELECT translation, created FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+        except sqlite3.Error as e:
+            print(f"Warning: translation cache read failed: {e}")
+            return None
+        if row is None:
+            return None
+        translation, created = row
+        if time.time() - created > CACHE_EXPIRY_SECONDS:
+            return None
+        return translation
+
+    def set(self, key: str, translation: str):
+        """Stores a translation (write-through after a successful API call)."""
+        try:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO translations (key, translation, created) VALUES (?, ?, ?)",
+                (key, translation, time.time()),
+            )
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Warning: translation cache write failed: {e}")
+
+    def delete(self, key: str):
+        """Removes a cached translation (e.g. after a bad result)."""
+        try:
+            self.conn.execute("DELETE FROM translations WHERE key = ?", (key,))
+            self.conn.commit()
+        except sqlite3.Error as e:
+            print(f"Warning: translation cache delete failed: {e}")
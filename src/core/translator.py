@@ -1,12 +1,22 @@
 from typing import List, Dict, Optional
-from ..models import MergedBlock, TranslatedBlock, Block # Need Block for original bbox
+from ..models import MergedBlock, TranslatedBlock
 from ..config import get_openai_client, AZURE_OPENAI_DEPLOYMENT_NAME
+from .translation_cache import TranslationCache
+import asyncio
+import orjson
+import os
 import time
 from openai import RateLimitError, APIError, Timeout, NotFoundError
-import re # For parsing the response
 
-# Configuration for batching translation requests
-TRANSLATION_BATCH_SIZE = 40 # Number of blocks to translate per API call
+# Configuration for batching translation requests. Batches are packed
+# greedily up to a token budget so short-caption batches carry more blocks
+# while long-paragraph batches stay clear of context/response limits.
+TRANSLATION_BATCH_TOKEN_BUDGET = 6000 # Approximate input tokens per batch
+TRANSLATION_MAX_BATCH_BLOCKS = 80 # Hard cap per batch (latency guard)
+# Rough English-token estimate; close enough for packing, no tokenizer dep.
+_CHARS_PER_TOKEN = 4
+# Maximum number of batch API calls in flight at once (bounded to respect TPM limits)
+TRANSLATE_CONCURRENCY = int(os.getenv("TRANSLATE_CONCURRENCY", "16"))
 
 class Translator:
     """Translates text blocks using Azure OpenAI via the openai library."""
@@ -15,24 +25,53 @@ class Translator:
                  system_prompt: Optional[str] = None,
                  translate_tone: str = "formal", # e.g., "formal", "friendly"
                  glossary: Optional[Dict[str, str]] = None):
-        self.client = get_openai_client()
         self.model = model
+        self.target_lang = "ko"
         self.glossary = glossary or {}
+        # Bounds concurrent batch requests across all chunks. Created lazily
+        # per event loop (see _get_sem): the GUI runs each job in its own
+        # asyncio.run() loop, and a contended Semaphore stays bound to the
+        # loop of its first waiter, so reusing one across runs raises
+        # "bound to a different event loop".
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._sem_loop: Optional[asyncio.AbstractEventLoop] = None
+        try:
+            self.cache: Optional[TranslationCache] = TranslationCache()
+        except Exception as e:
+            print(f"Warning: translation cache unavailable ({e}). Continuing without it.")
+            self.cache = None
         # Build system prompt after glossary is set
         self.system_prompt = system_prompt or self._build_default_system_prompt(translate_tone, self.glossary)
-        
+
+    @property
+    def client(self):
+        """The AsyncAzureOpenAI client for the current event loop.
+
+        Resolved per call rather than held on the instance: the Translator
+        outlives each job's event loop, and a client's keepalive connections
+        are only valid on the loop they were opened on.
+        """
+        return get_openai_client()
+
+    def _get_sem(self) -> asyncio.Semaphore:
+        """Returns the batch-concurrency semaphore for the current loop."""
+        loop = asyncio.get_running_loop()
+        if self._sem is None or self._sem_loop is not loop:
+            self._sem = asyncio.Semaphore(TRANSLATE_CONCURRENCY)
+            self._sem_loop = loop
+        return self._sem
 
     def _build_default_system_prompt(self, tone: str, glossary: Dict[str, str]) -> str:
         tone_instruction = "Translate formally and accurately." if tone == "formal" else "Translate in a friendly and natural tone."
-        # Updated prompt for batch processing
+        # Updated prompt for batch processing (JSON mode keeps parsing deterministic)
         base_prompt = f"""You are an expert translator. Translate the following numbered English texts to Korean. {tone_instruction} Maintain the original meaning and context.
-Return the translations also numbered and separated EXACTLY by '|||' (three pipe characters).
+Return a JSON object with a single key "translations" whose value is an array of objects {{"id": <input number>, "text": "<Korean translation>"}}, one per input, in input order.
 Example Input:
 1. Hello world
 2. How are you?
 
 Example Output:
-1. 안녕하세요 월드 ||| 2. 어떻게 지내세요?
+{{"translations": [{{"id": 1, "text": "안녕하세요 월드"}}, {{"id": 2, "text": "어떻게 지내세요?"}}]}}
 """
 
         if glossary:
@@ -44,18 +83,17 @@ Example Output:
         base_prompt += "\nTranslate the user's numbered text now:"
         return base_prompt
 
-    def translate_blocks(self, merged_blocks: List[MergedBlock], original_blocks_map: Dict[str, Block]) -> List[TranslatedBlock]:
+    async def translate_blocks(self, merged_blocks: List[MergedBlock]) -> List[TranslatedBlock]:
         """Translates a list of merged text blocks in batches.
 
         Args:
-            merged_blocks: List of MergedBlock objects to translate.
-            original_blocks_map: A dictionary mapping original block IDs to Block objects
-                                 to retrieve the original bounding box.
+            merged_blocks: List of MergedBlock objects to translate. Each
+                carries the union bbox of its original blocks.
 
         Returns:
             A list of TranslatedBlock objects.
         """
-        print(f"[Translator] Starting batched translation for {len(merged_blocks)} blocks (batch size: {TRANSLATION_BATCH_SIZE})...")
+        print(f"[Translator] Starting batched translation for {len(merged_blocks)} blocks (token budget: {TRANSLATION_BATCH_TOKEN_BUDGET})...")
         all_translated_data: List[TranslatedBlock] = []
         if not merged_blocks:
             print("[Translator] No blocks to translate.")
@@ -68,136 +106,301 @@ Example Output:
         
         print(f"[Translator] Translating {len(non_empty_blocks)} non-empty blocks.")
 
-        # Process blocks in batches
-        for i in range(0, len(non_empty_blocks), TRANSLATION_BATCH_SIZE):
-            batch_blocks = non_empty_blocks[i : i + TRANSLATION_BATCH_SIZE]
-            batch_texts = [block.text for block in batch_blocks]
+        # Translation-memory lookup: serve repeated/previously seen text from
+        # the persistent cache and only send misses to the API.
+        blocks_to_translate: List[MergedBlock] = []
+        cache_hits = 0
+        for block in non_empty_blocks:
+            cached_translation = self._cache_lookup(block.text)
+            if cached_translation is not None:
+                all_translated_data.append(TranslatedBlock(
+                    id=block.id,
+                    original_text=block.text,
+                    translated_text=cached_translation,
+                    bbox=block.bbox,
+                    page_number=block.page_number
+                ))
+                cache_hits += 1
+            else:
+                blocks_to_translate.append(block)
+        if cache_hits:
+            print(f"[Translator] {cache_hits} blocks served from translation cache.")
+        if not blocks_to_translate:
+            print(f"[Translator] All blocks resolved from cache. Returning {len(all_translated_data)} translated blocks.")
+            return all_translated_data
+
+        # Dispatch the batches concurrently; the shared semaphore bounds the
+        # number of in-flight requests so TPM limits are respected. Wall time
+        # per chunk becomes roughly the slowest batch instead of the sum.
+        batches = self._pack_batches(blocks_to_translate)
+        batch_results = await asyncio.gather(
+            *(self._translate_batch_bounded(batch_index, batch_blocks)
+              for batch_index, batch_blocks in enumerate(batches)))
+        for batch_translated in batch_results:
+            all_translated_data.extend(batch_translated)
+
+        print(f"[Translator] Finished batched translation. Returning {len(all_translated_data)} translated blocks.")
+        return all_translated_data
+
+    def _pack_batches(self, blocks: List[MergedBlock]) -> List[List[MergedBlock]]:
+        """Packs blocks greedily into batches up to the token budget.
+
+        A fixed block count wastes calls on short captions and risks response
+        truncation on long paragraphs; packing by estimated tokens keeps each
+        request near the budget regardless of text length. The block-count
+        cap bounds per-request latency.
+        """
+        batches: List[List[MergedBlock]] = []
+        current: List[MergedBlock] = []
+        current_tokens = 0
+        for block in blocks:
+            block_tokens = max(1, len(block.text) // _CHARS_PER_TOKEN)
+            if current and (current_tokens + block_tokens > TRANSLATION_BATCH_TOKEN_BUDGET
+                            or len(current) >= TRANSLATION_MAX_BATCH_BLOCKS):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(block)
+            current_tokens += block_tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _translate_batch_bounded(self, batch_index: int,
+                                       batch_blocks: List[MergedBlock]) -> List[TranslatedBlock]:
+        """Runs one batch translation while holding the concurrency semaphore."""
+        async with self._get_sem():
+            return await self._translate_batch(batch_index, batch_blocks)
+
+    async def _translate_batch(self, batch_index: int,
+                               batch_blocks: List[MergedBlock]) -> List[TranslatedBlock]:
+        """Translates a single batch of blocks, with retries and individual fallback."""
+        translated_data: List[TranslatedBlock] = []
+        batch_texts = [block.text for block in batch_blocks]
+
+        # Format the request for the batch
+        numbered_texts = "\n".join([f"{idx+1}. {text}" for idx, text in enumerate(batch_texts)])
 
-            # Format the request for the batch
-            numbered_texts = "\n".join([f"{idx+1}. {text}" for idx, text in enumerate(batch_texts)])
-            
-            print(f"[Translator] Processing batch {i // TRANSLATION_BATCH_SIZE + 1} ({len(batch_blocks)} blocks)...")
+        print(f"[Translator] Processing batch {batch_index + 1} ({len(batch_blocks)} blocks)...")
 
-            # Simple retry logic for the batch API call
-            max_retries = 3
-            retry_delay = 5 # seconds
-            request_timeout = 60 # seconds per attempt (increased for potentially larger requests)
-            translated_texts_in_batch = []
+        # Simple retry logic for the batch API call
+        max_retries = 3
+        retry_delay = 5 # seconds
+        request_timeout = 60 # seconds per attempt (increased for potentially larger requests)
+        translated_texts_in_batch = []
 
-            for attempt in range(max_retries):
+        for attempt in range(max_retries):
+            try:
+                print(f"  Attempt {attempt + 1}/{max_retries}: Calling OpenAI API for batch...")
+                start_api_call = time.time()
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": self.system_prompt},
+                        {"role": "user", "content": numbered_texts}
+                    ],
+                    temperature=0.3,
+                    timeout=request_timeout,
+                    response_format={"type": "json_object"},
+                    # max_tokens might be necessary for large batches
+                )
+                api_duration = time.time() - start_api_call
+                raw_response_text = response.choices[0].message.content.strip()
+                print(f"  Attempt {attempt + 1} successful. API call duration: {api_duration:.2f}s.")
+
+                # Parse the JSON response:
+                # {"translations": [{"id": 1, "text": "..."}, ...]}
+                cleaned_translations = None
                 try:
-                    print(f"  Attempt {attempt + 1}/{max_retries}: Calling OpenAI API for batch...")
-                    start_api_call = time.time()
-                    response = self.client.chat.completions.create(
-                        model=self.model,
-                        messages=[
-                            {"role": "system", "content": self.system_prompt},
-                            {"role": "user", "content": numbered_texts}
-                        ],
-                        temperature=0.3,
-                        timeout=request_timeout,
-                        # max_tokens might be necessary for large batches
-                    )
-                    api_duration = time.time() - start_api_call
-                    raw_response_text = response.choices[0].message.content.strip()
-                    print(f"  Attempt {attempt + 1} successful. API call duration: {api_duration:.2f}s.")
-                    # print(f" Raw response: {raw_response_text}") # Debug
-
-                    # Parse the combined response
-                    # Expecting format like "1. translation1 ||| 2. translation2 ||| ..."
-                    parsed_translations = [t.strip() for t in raw_response_text.split('|||')]
-                    
-                    # Refined parsing to remove the "N. " prefix
-                    cleaned_translations = []
-                    for t in parsed_translations:
-                        # Remove leading number and period, like "1. " or "23. "
-                        cleaned = re.sub(r"^\d+\.\s*", "", t).strip()
-                        cleaned_translations.append(cleaned)
-
-                    if len(cleaned_translations) == len(batch_blocks):
-                        translated_texts_in_batch = cleaned_translations
-                        print(f"  Successfully parsed {len(translated_texts_in_batch)} translations from batch response.")
-                        break # Exit retry loop on success
-                    else:
-                        print(f"  Warning: Mismatch after parsing batch response. Expected {len(batch_blocks)}, got {len(cleaned_translations)}. Raw response: '{raw_response_text}'")
-                        if attempt == max_retries - 1:
-                             print(f"  Failed to parse response correctly after {max_retries} attempts. Skipping batch.")
-                             # Decide: skip batch or fall back to individual translation? Skipping for now.
-                        else:
-                             print(f"  Retrying batch due to parsing mismatch...")
-                             time.sleep(retry_delay)
-                             retry_delay *= 1.5
-
-
-                # --- Exception Handling (same as before, but applied to batch) ---
-                except NotFoundError as e:
-                    print(f"OpenAI Error: Resource not found (404) during batch processing. Please check AZURE_OPENAI_DEPLOYMENT_NAME. Details: {e}")
-                    raise e
-                except RateLimitError as e:
-                    print(f"Rate limit error during batch processing: {e}. Retrying in {retry_delay}s... (Attempt {attempt + 1}/{max_retries})")
-                    time.sleep(retry_delay)
-                    retry_delay *= 2
-                except Timeout as e:
-                    print(f"Timeout error during batch processing after {request_timeout}s: {e}. Retrying in {retry_delay}s... (Attempt {attempt + 1}/{max_retries})")
-                    time.sleep(retry_delay)
-                    retry_delay *= 1.5
-                except APIError as e:
-                    print(f"API error during batch processing (Status: {e.status_code}): {e}. Retrying in {retry_delay}s... (Attempt {attempt + 1}/{max_retries})")
-                    if e.status_code == 400:
-                        print("Potential content filter issue or invalid request in batch. Skipping batch.")
-                        break # Don't retry bad requests
-                    time.sleep(retry_delay)
-                    retry_delay *= 2
-                except Exception as e:
-                    print(f"Unexpected error during batch processing: {e}")
-                    import traceback
-                    print(f"Traceback: {traceback.format_exc()}")
-                    break # Skip batch on unexpected error
-            else: # This else belongs to the 'for attempt' loop
-                print(f"Failed to translate batch starting with block '{batch_blocks[0].id}' after {max_retries} attempts due to API errors or parsing issues.")
-                print("Falling back to individual translation for this batch.")
-                # --- Fallback to individual translation --- 
-                for block_in_batch in batch_blocks:
-                     individual_translated_text = self._translate_single_block_with_retry(block_in_batch)
-                     if individual_translated_text is not None:
-                         first_original_id = block_in_batch.original_block_ids[0]
-                         original_block = original_blocks_map.get(first_original_id)
-                         if original_block:
-                             all_translated_data.append(TranslatedBlock(
-                                id=block_in_batch.id,
-                                original_text=block_in_batch.text,
-                                translated_text=individual_translated_text,
-                                bbox=original_block.bbox,
-                                page_number=block_in_batch.page_number
-                            ))
-                         else:
-                             print(f"Warning (Fallback): Could not find original block {first_original_id} for bbox for merged block {block_in_batch.id}.")
-                     # else: # Error message already printed in _translate_single_block_with_retry
-                         # pass
-                # --- End Fallback --- 
-                continue # Move to the next batch
-
-            # If translation was successful for the batch, create TranslatedBlock objects
-            if translated_texts_in_batch: # This check is important
-                 for original_m_block, translated_text in zip(batch_blocks, translated_texts_in_batch):
-                    first_original_id = original_m_block.original_block_ids[0]
-                    original_block = original_blocks_map.get(first_original_id)
-                    if original_block:
-                         all_translated_data.append(TranslatedBlock(
-                            id=original_m_block.id,
-                            original_text=original_m_block.text,
-                            translated_text=translated_text,
-                            bbox=original_block.bbox,
-                            page_number=original_m_block.page_number
-                        ))
-                         # print(f"  Added translated block: {original_m_block.id} -> {translated_text[:30]}...") # Debug
+                    payload = orjson.loads(raw_response_text)
+                    by_id = {int(item["id"]): str(item["text"]).strip()
+                             for item in payload["translations"]}
+                    cleaned_translations = [by_id[i] for i in range(1, len(batch_blocks) + 1)]
+                except (ValueError, KeyError, TypeError) as parse_err:
+                    print(f"  Warning: Could not parse JSON batch response: {parse_err}")
+
+                if cleaned_translations is not None:
+                    translated_texts_in_batch = cleaned_translations
+                    print(f"  Successfully parsed {len(translated_texts_in_batch)} translations from batch response.")
+                    break # Exit retry loop on success
+                else:
+                    print(f"  Warning: Incomplete batch response. Expected {len(batch_blocks)} translations. Raw response: '{raw_response_text}'")
+                    if attempt == max_retries - 1:
+                         print(f"  Failed to parse response correctly after {max_retries} attempts. Skipping batch.")
+                         # Decide: skip batch or fall back to individual translation? Skipping for now.
                     else:
-                        print(f"Warning: Could not find original block {first_original_id} for bbox for merged block {original_m_block.id}.")
+                         print(f"  Retrying batch due to parsing mismatch...")
+                         await asyncio.sleep(retry_delay)
+                         retry_delay *= 1.5
 
-        print(f"[Translator] Finished batched translation. Returning {len(all_translated_data)} translated blocks.")
-        return all_translated_data
 
-    def _translate_single_block_with_retry(self, block: MergedBlock) -> Optional[str]:
+            # --- Exception Handling (same as before, but applied to batch) ---
+            except NotFoundError as e:
+                print(f"OpenAI Error: Resource not found (404) during batch processing. Please check AZURE_OPENAI_DEPLOYMENT_NAME. Details: {e}")
+                raise e
+            except RateLimitError as e:
+                print(f"Rate limit error during batch processing: {e}. Retrying in {retry_delay}s... (Attempt {attempt + 1}/{max_retries})")
+                await asyncio.sleep(retry_delay)
+                retry_delay *= 2
+            except Timeout as e:
+                print(f"Timeout error during batch processing after {request_timeout}s: {e}. Retrying in {retry_delay}s... (Attempt {attempt + 1}/{max_retries})")
+                await asyncio.sleep(retry_delay)
+                retry_delay *= 1.5
+            except APIError as e:
+                print(f"API error during batch processing (Status: {e.status_code}): {e}. Retrying in {retry_delay}s... (Attempt {attempt + 1}/{max_retries})")
+                if e.status_code == 400:
+                    print("Potential content filter issue or invalid request in batch. Skipping batch.")
+                    break # Don't retry bad requests
+                await asyncio.sleep(retry_delay)
+                retry_delay *= 2
+            except Exception as e:
+                print(f"Unexpected error during batch processing: {e}")
+                import traceback
+                print(f"Traceback: {traceback.format_exc()}")
+                break # Skip batch on unexpected error
+        else: # This else belongs to the 'for attempt' loop
+            print(f"Failed to translate batch starting with block '{batch_blocks[0].id}' after {max_retries} attempts due to API errors or parsing issues.")
+            print("Falling back to individual translation for this batch.")
+            # --- Fallback to individual translation --- 
+            for block_in_batch in batch_blocks:
+                 individual_translated_text = await self._translate_single_block_with_retry(block_in_batch)
+                 if individual_translated_text is not None:
+                     self._cache_store(block_in_batch.text, individual_translated_text)
+                     translated_data.append(TranslatedBlock(
+                        id=block_in_batch.id,
+                        original_text=block_in_batch.text,
+                        translated_text=individual_translated_text,
+                        bbox=block_in_batch.bbox,
+                        page_number=block_in_batch.page_number
+                    ))
+                 # else: # Error message already printed in _translate_single_block_with_retry
+                     # pass
+            # --- End Fallback --- 
+            return translated_data
+
+        # If translation was successful for the batch, create TranslatedBlock objects
+        if translated_texts_in_batch: # This check is important
+             for original_m_block, translated_text in zip(batch_blocks, translated_texts_in_batch):
+                self._cache_store(original_m_block.text, translated_text)
+                translated_data.append(TranslatedBlock(
+                    id=original_m_block.id,
+                    original_text=original_m_block.text,
+                    translated_text=translated_text,
+                    bbox=original_m_block.bbox,
+                    page_number=original_m_block.page_number
+                ))
+
+        return translated_data
+
+    async def submit_batch(self, texts_by_custom_id: Dict[str, str]) -> str:
+        """Submits all texts as a single Azure OpenAI Batch API job.
+
+        Args:
+            texts_by_custom_id: Mapping of custom_id (e.g. "chunk_id:block_id")
+                to the source text to translate.
+
+        Returns:
+            The batch job id to poll with wait_for_batch.
+        """
+        single_prompt = self.system_prompt.split("Return a JSON object")[0]
+        single_prompt += "\nTranslate the user's text now:"
+
+        lines = []
+        for custom_id, text in texts_by_custom_id.items():
+            lines.append(orjson.dumps({
+                "custom_id": custom_id,
+                "method": "POST",
+                "url": "/chat/completions",
+                "body": {
+                    "model": self.model,
+                    "messages": [
+                        {"role": "system", "content": single_prompt},
+                        {"role": "user", "content": text},
+                    ],
+                    "temperature": 0.3,
+                },
+            }))
+        payload = b"\n".join(lines)
+
+        batch_file = await self.client.files.create(
+            file=("translations.jsonl", payload), purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/chat/completions",
+            completion_window="24h")
+        print(f"[Translator] Submitted batch job {batch.id} with {len(lines)} requests.")
+        return batch.id
+
+    async def wait_for_batch(self, batch_id: str,
+                             initial_delay: float = 30.0,
+                             max_delay: float = 600.0) -> Dict[str, str]:
+        """Polls a batch job with exponential backoff until it completes.
+
+        Returns:
+            Mapping of custom_id to translated text.
+        """
+        delay = initial_delay
+        while True:
+            batch = await self.client.batches.retrieve(batch_id)
+            if batch.status == "completed":
+                break
+            if batch.status in ("failed", "expired", "cancelled"):
+                raise RuntimeError(f"Batch job {batch_id} ended with status '{batch.status}'.")
+            print(f"[Translator] Batch {batch_id} status '{batch.status}'. Polling again in {delay:.0f}s...")
+            await asyncio.sleep(delay)
+            delay = min(delay * 1.5, max_delay)
+
+        output = await self.client.files.content(batch.output_file_id)
+        translations: Dict[str, str] = {}
+        for line in output.text.splitlines():
+            if not line.strip():
+                continue
+            item = orjson.loads(line)
+            body = (item.get("response") or {}).get("body") or {}
+            choices = body.get("choices") or []
+            if choices:
+                translations[item["custom_id"]] = choices[0]["message"]["content"].strip()
+            else:
+                print(f"[Translator] Batch item {item.get('custom_id')} returned no choices.")
+        print(f"[Translator] Batch {batch_id} completed with {len(translations)} translations.")
+        return translations
+
+    async def translate_texts_via_batch_api(self, texts_by_custom_id: Dict[str, str]) -> Dict[str, str]:
+        """Translates texts through the Batch API, consulting the cache first."""
+        results: Dict[str, str] = {}
+        misses: Dict[str, str] = {}
+        for custom_id, text in texts_by_custom_id.items():
+            cached = self._cache_lookup(text)
+            if cached is not None:
+                results[custom_id] = cached
+            else:
+                misses[custom_id] = text
+        if misses:
+            batch_id = await self.submit_batch(misses)
+            translated = await self.wait_for_batch(batch_id)
+            for custom_id, translation in translated.items():
+                self._cache_store(misses[custom_id], translation)
+            results.update(translated)
+        return results
+
+    def _cache_key(self, text: str) -> str:
+        return TranslationCache.make_key(text, self.target_lang, self.model)
+
+    def _cache_lookup(self, text: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.get(self._cache_key(text))
+
+    def _cache_store(self, text: str, translation: str):
+        if self.cache is not None:
+            self.cache.set(self._cache_key(text), translation)
+
+    def invalidate(self, text: str):
+        """Drops a cached translation so the next run re-translates the text."""
+        if self.cache is not None:
+            self.cache.delete(self._cache_key(text))
+
+    async def _translate_single_block_with_retry(self, block: MergedBlock) -> Optional[str]:
         """Translates a single block with retry logic. Helper for fallback."""
         max_retries = 3
         retry_delay = 2
@@ -205,14 +408,14 @@ Example Output:
         text_to_translate = block.text
 
         # Build a simpler prompt for single translation
-        single_prompt = self.system_prompt.split("Return the translations also numbered")[0] # Remove batch instructions
+        single_prompt = self.system_prompt.split("Return a JSON object")[0] # Remove batch-format instructions
         single_prompt += "\nTranslate the user's text now:"
 
         for attempt in range(max_retries):
             try:
                 print(f"  Fallback Attempt {attempt + 1}/{max_retries}: Translating block {block.id} individually...")
                 start_api_call = time.time()
-                response = self.client.chat.completions.create(
+                response = await self.client.chat.completions.create(
                     model=self.model,
                     messages=[
                         {"role": "system", "content": single_prompt},
@@ -230,18 +433,18 @@ Example Output:
                  raise e # Still raise this, likely a config error
             except RateLimitError as e:
                  print(f"Rate limit error (Fallback) block {block.id}: {e}. Retrying in {retry_delay}s... (Attempt {attempt + 1}/{max_retries})")
-                 time.sleep(retry_delay)
+                 await asyncio.sleep(retry_delay)
                  retry_delay *= 2
             except Timeout as e:
                  print(f"Timeout error (Fallback) block {block.id}: {e}. Retrying in {retry_delay}s... (Attempt {attempt + 1}/{max_retries})")
-                 time.sleep(retry_delay)
+                 await asyncio.sleep(retry_delay)
                  retry_delay *= 1.5
             except APIError as e:
                  print(f"API error (Fallback) block {block.id} (Status: {e.status_code}): {e}. Retrying... (Attempt {attempt + 1}/{max_retries})")
                  if e.status_code == 400:
                      print("Potential content filter/invalid request (Fallback). Skipping block.")
                      break
-                 time.sleep(retry_delay)
+                 await asyncio.sleep(retry_delay)
                  retry_delay *= 2
             except Exception as e:
                  print(f"Unexpected error (Fallback) translating block {block.id}: {e}")
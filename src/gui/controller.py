@@ -1,6 +1,12 @@
 from PySide6.QtCore import QObject, Signal
+import asyncio
+import fitz # PyMuPDF
+import hashlib
 import os
 import csv
+import logging
+import pickle
+import time
 from typing import Dict, Any, Optional
 
 # Import core components
@@ -13,6 +19,8 @@ from ..core.page_renderer import PageRenderer
 from ..core.exporter import Exporter
 from ..core.chunk_processor import ChunkProcessor
 
+logger = logging.getLogger(__name__)
+
 class UIController(QObject):
     """Handles the interaction between the GUI and the backend processing logic."""
     # Signal to update GUI progress: current_step, total_steps, status_message
@@ -32,6 +40,8 @@ class UIController(QObject):
         self.page_renderer: Optional[PageRenderer] = None # Initialize later
         self.exporter = Exporter()
         self.chunk_processor: Optional[ChunkProcessor] = None # Initialize later
+        self._font_key = None # (font_name, font_path, font_size) of the last build
+        self._last_progress_emit = 0.0 # Monotonic time of the last emission
         self.total_chunks = 0
 
     def _initialize_processing_components(self, options: Dict[str, Any]):
@@ -43,7 +53,24 @@ class UIController(QObject):
         font_path = font_path_option if font_path_option is not None else DEFAULT_FONT_PATH
         # 기본 폰트 크기를 9로 줄임
         font_size = options.get("font_size", 7)
-        
+
+        # Same font settings as the previous run: everything below would
+        # rebuild to an identical state, so skip the TTF re-registration and
+        # component rebinding entirely.
+        font_key = (font_name, font_path, font_size)
+        if font_key == self._font_key and self.layout_engine is not None:
+            logger.info("Processing components unchanged (same font settings). Skipping re-initialization.")
+            return
+
+        # Font settings changed: the render process pools baked the previous
+        # font into their workers via the pool initializer, so tear them
+        # down — they are lazily recreated with the new initargs on next use.
+        if self._font_key is not None:
+            if self.page_renderer is not None:
+                self.page_renderer.shutdown()
+            if self.chunk_processor is not None:
+                self.chunk_processor.shutdown()
+
         # Register the font first
         resolved_font_name = register_font(font_name, font_path)
         
@@ -51,7 +78,8 @@ class UIController(QObject):
         if not self.layout_engine:
             self.layout_engine = LayoutEngine(font_name=resolved_font_name, font_path=font_path, default_font_size=font_size)
         else:
-            self.layout_engine.update_paragraph_style(font_name=resolved_font_name, font_size=font_size)
+            self.layout_engine.update_paragraph_style(font_name=resolved_font_name, font_size=font_size,
+                                                      font_path=font_path)
         
         if not self.page_renderer:
             self.page_renderer = PageRenderer(self.layout_engine)
@@ -69,13 +97,28 @@ class UIController(QObject):
         self.chunk_processor.translator = self.translator
         self.chunk_processor.layout_engine = self.layout_engine
         self.chunk_processor.page_renderer = self.page_renderer
-        
-        print(f"Processing components initialized/updated. Using font: {resolved_font_name}")
+        self._font_key = font_key
+
+        logger.info("Processing components initialized/updated. Using font: %s", resolved_font_name)
+
+    def _emit_progress(self, current_step: int, total_steps: int, status_message: str):
+        """Emits progress, throttled to ~30 Hz for intermediate steps.
+
+        Hundreds of chunks can finish faster than the GUI drains queued
+        signals; dropping emissions closer together than 33 ms keeps the
+        event queue shallow. The first and terminal steps always go through
+        so the bar starts at zero and ends full.
+        """
+        now = time.monotonic()
+        if (current_step in (0, total_steps)
+                or now - self._last_progress_emit > 0.033):
+            self.progress_signal.emit(current_step, total_steps, status_message)
+            self._last_progress_emit = now
 
     def start_processing(self, pdf_path: str, output_dir: str, options: Dict[str, Any]) -> str:
         """Starts the PDF translation process (intended to be called by the background thread)."""
         try:
-            print(f"Processing started for: {pdf_path} with options: {options}")
+            logger.info("Processing started for: %s with options: %s", pdf_path, options)
             base_filename = os.path.splitext(os.path.basename(pdf_path))[0]
             output_filename = f"{base_filename}_translated.pdf"
             output_path = os.path.join(output_dir, output_filename)
@@ -95,70 +138,131 @@ class UIController(QObject):
             # Initialize/Update components like LayoutEngine with font info from options
             self._initialize_processing_components(options)
 
-            # --- Processing Steps --- 
+            # --- Processing Steps ---
             # Estimate total steps for progress bar (1 load + N chunks + 1 save)
-            
-            # 1. Load and split PDF
-            self.progress_signal.emit(0, 1, "PDF 로딩 및 청크 분할 중...") # Step 0 of N+1
-            chunks, total_pages = self.pdf_loader.load_and_split(pdf_path)
-            if not chunks:
-                raise ValueError("PDF를 로드하거나 청크로 분할할 수 없습니다.")
-            self.total_chunks = len(chunks)
-            total_steps = 1 + self.total_chunks + 1 # Load + Chunks + Save
-
-            # 2. Process chunks sequentially
-            all_rendered_pages: Dict[int, bytes] = {}
-            if self.chunk_processor is None:
-                 raise RuntimeError("Chunk processor not initialized.") # Should not happen
-                
-            for i, chunk in enumerate(chunks):
-                current_step = i + 1 # Step 1 to N
-                status = f"청크 {i+1}/{self.total_chunks} 처리 중 (페이지 {chunk.page_numbers[0]}-{chunk.page_numbers[1]})..."
-                self.progress_signal.emit(current_step, total_steps, status)
-                
-                rendered_chunk_pages = self.chunk_processor.process_chunk(pdf_path, chunk)
-                all_rendered_pages.update(rendered_chunk_pages)
-                
-            # 3. Combine and save
-            if not all_rendered_pages:
-                 raise ValueError("번역 및 렌더링된 페이지가 없습니다.")
-                 
+
+            # Open the source PDF once and share the handle through the whole
+            # pipeline (page counting, parsing, rendering) instead of
+            # re-parsing the file at every stage.
+            with fitz.open(pdf_path) as pdf_doc:
+                # 1. Load and split PDF
+                self._emit_progress(0, 1, "PDF 로딩 및 청크 분할 중...") # Step 0 of N+1
+                chunks, total_pages = self.pdf_loader.load_and_split(pdf_path, pdf_doc)
+                if not chunks:
+                    raise ValueError("PDF를 로드하거나 청크로 분할할 수 없습니다.")
+                self.total_chunks = len(chunks)
+                total_steps = 1 + self.total_chunks + 1 # Load + Chunks + Save
+
+                # 2. Process chunks concurrently on an asyncio event loop
+                if self.chunk_processor is None:
+                     raise RuntimeError("Chunk processor not initialized.") # Should not happen
+
+                self._emit_progress(1, total_steps, f"청크 {self.total_chunks}개 동시 처리 시작...")
+                completed_chunks = 0
+
+                def _on_chunk_done(chunk):
+                    # Invoked from the event-loop thread as each chunk finishes;
+                    # the queued signal connection delivers it to the GUI thread.
+                    nonlocal completed_chunks
+                    completed_chunks += 1
+                    status = f"청크 {completed_chunks}/{self.total_chunks} 완료 (페이지 {chunk.page_numbers[0]}-{chunk.page_numbers[1]})"
+                    self._emit_progress(completed_chunks, total_steps, status)
+
+                # Rendered pages stream straight into the exporter as each
+                # chunk finishes, so page bytes never accumulate across the
+                # whole document.
+                self.exporter.open(output_path)
+                asyncio.run(
+                    self.chunk_processor.process_all(
+                        pdf_path, chunks,
+                        progress_callback=_on_chunk_done,
+                        use_batch_api=options.get("use_batch_api", False),
+                        pdf_doc=pdf_doc,
+                        on_chunk_rendered=self.exporter.append_pages,
+                        max_concurrent=options.get("workers"))
+                )
+
+            # 3. Finalize and save
             save_step = self.total_chunks + 1 # Step N+1
-            self.progress_signal.emit(save_step, total_steps, f"최종 PDF 파일 저장 중... ({output_path})")
-            self.exporter.save_pdf(all_rendered_pages, total_pages, output_path)
+            self._emit_progress(save_step, total_steps, f"최종 PDF 파일 저장 중... ({output_path})")
+            added_pages = self.exporter.close(total_pages)
+            if added_pages == 0:
+                 raise ValueError("번역 및 렌더링된 페이지가 없습니다.")
 
-            self.progress_signal.emit(total_steps, total_steps, "번역 완료!")
-            print(f"Processing finished. Output: {output_path}")
+            self._emit_progress(total_steps, total_steps, "번역 완료!")
+            logger.info("Processing finished. Output: %s", output_path)
             return output_path 
             
         except Exception as e:
-            print(f"Error during processing: {e}")
+            logger.exception("Error during processing: %s", e)
+            self.exporter.discard() # Drop any partially built output document
             # Ensure progress signal indicates failure if possible
-            self.progress_signal.emit(0, 1, f"오류: {e}") # Reset progress, show error
+            self._emit_progress(0, 1, f"오류: {e}") # Reset progress, show error
             raise # Re-raise exception for the thread to catch
 
+    @staticmethod
+    def _glossary_cache_path(path: str) -> str:
+        """Cache file path for a glossary CSV, keyed by path + mtime + size.
+
+        Editing or replacing the CSV changes the key, so invalidation is
+        automatic; stale cache files are simply never read again.
+        """
+        stat = os.stat(path)
+        key = f"{os.path.abspath(path)}|{stat.st_mtime_ns}|{stat.st_size}".encode("utf-8")
+        digest = hashlib.blake2b(key, digest_size=16).hexdigest()
+        cache_dir = os.path.join(os.path.expanduser("~"), ".cache", "translatepdf")
+        os.makedirs(cache_dir, exist_ok=True)
+        return os.path.join(cache_dir, f"glossary_{digest}.pkl")
+
     def _load_glossary(self, path: str) -> Dict[str, str]:
+        """Loads a glossary, serving repeat runs from a pickled cache."""
+        try:
+            cache_path = self._glossary_cache_path(path)
+        except OSError:
+            cache_path = None # stat failed; let the CSV loader report it
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'rb') as f:
+                    glossary_data = pickle.load(f)
+                logger.info("Loaded %d terms from glossary cache: %s", len(glossary_data), path)
+                return glossary_data
+            except Exception as e:
+                logger.warning("Could not read glossary cache (%s). Re-parsing CSV.", e)
+        glossary_data = self._parse_glossary_csv(path)
+        if cache_path and glossary_data:
+            try:
+                with open(cache_path, 'wb') as f:
+                    pickle.dump(glossary_data, f, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception as e:
+                logger.warning("Could not write glossary cache: %s", e)
+        return glossary_data
+
+    def _parse_glossary_csv(self, path: str) -> Dict[str, str]:
         """Loads glossary from a CSV file (eng,kor)."""
-        glossary_data = {}
+        glossary_data: Dict[str, str] = {}
+        skipped = 0
         try:
-            with open(path, mode='r', encoding='utf-8-sig') as csvfile: # utf-8-sig handles BOM
-                reader = csv.reader(csvfile)
-                # Skip header if present (optional)
-                # next(reader, None) 
-                for i, row in enumerate(reader):
+            # utf-8-sig handles BOM; csv.reader tokenizes in C, so the loop
+            # body stays minimal — no per-row prints, malformed rows are
+            # counted and reported once at the end.
+            with open(path, mode='r', encoding='utf-8-sig', newline='') as csvfile:
+                for row in csv.reader(csvfile):
                     if len(row) == 2:
-                        eng, kor = row[0].strip(), row[1].strip()
+                        eng = row[0].strip()
+                        kor = row[1].strip()
                         if eng and kor:
-                             glossary_data[eng] = kor
+                            glossary_data[eng] = kor
                         else:
-                            print(f"Warning: Skipping empty entry in glossary row {i+1}")
+                            skipped += 1
                     elif row: # Non-empty row with wrong number of columns
-                         print(f"Warning: Skipping malformed glossary row {i+1}: {row}")
-            print(f"Loaded {len(glossary_data)} terms from glossary: {path}")
+                        skipped += 1
+            if skipped:
+                logger.warning("Skipped %d malformed or empty glossary rows in %s", skipped, path)
+            logger.info("Loaded %d terms from glossary: %s", len(glossary_data), path)
         except FileNotFoundError:
-            print(f"Error: Glossary file not found at {path}")
+            logger.error("Glossary file not found at %s", path)
         except Exception as e:
-            print(f"Error reading glossary file {path}: {e}")
+            logger.error("Error reading glossary file %s: %s", path, e)
         return glossary_data
 
     def get_total_chunks(self) -> int:
@@ -1,17 +1,21 @@
 import sys
 import os
+import re
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
     QPushButton, QLabel, QLineEdit, QFileDialog, QProgressBar, 
-    QComboBox, QTextEdit, QGroupBox, QScrollArea, QSizePolicy
+    QComboBox, QPlainTextEdit, QGroupBox, QScrollArea, QSizePolicy
 )
 from PySide6.QtCore import Qt, Slot, QThread, Signal
 from .controller import UIController # Import controller
 
 class ProcessingThread(QThread):
-    """Worker thread for long-running PDF processing."""
-    # Connect controller's signal to this thread's signal emitter
-    # progress_updated = Signal(int, int, str) # current_step, total_steps, status_message
+    """Worker thread for long-running PDF processing.
+
+    Progress is NOT proxied through this thread: the GUI connects straight
+    to the controller's progress_signal with a queued connection, so each
+    update crosses threads once instead of twice.
+    """
     processing_finished = Signal(str) # output_path or error message
 
     def __init__(self, controller: UIController, pdf_path: str, output_dir: str, options: dict):
@@ -20,31 +24,15 @@ class ProcessingThread(QThread):
         self.pdf_path = pdf_path
         self.output_dir = output_dir
         self.options = options
-        # Signal proxy: Connect controller's progress signal to the thread's signal
-        # This allows the GUI to connect to the thread's signal directly
-        # self.controller.progress_signal.connect(self.progress_updated.emit)
-
-    # Re-declare the signal here if needed for direct connection in run()
-    progress_updated = Signal(int, int, str)
 
     def run(self):
         """Runs the processing logic in the background."""
         try:
-            # Connect controller signal to this thread's signal emitter *within the thread*
-            # This ensures the signal is emitted correctly from the thread context
-            self.controller.progress_signal.connect(self.progress_updated.emit)
-            
             output_path = self.controller.start_processing(self.pdf_path, self.output_dir, self.options)
             self.processing_finished.emit(output_path)
         except Exception as e:
             # Ensure error message is emitted via the finished signal
             self.processing_finished.emit(f"Error: {e}")
-        finally:
-            # Disconnect signal when done to avoid issues if thread is reused (though it shouldn't be)
-            try:
-                 self.controller.progress_signal.disconnect(self.progress_updated.emit)
-            except (RuntimeError, TypeError): # Ignore if already disconnected or errors
-                 pass 
 
 class MainGUI(QMainWindow):
     """Main application window."""
@@ -56,11 +44,16 @@ class MainGUI(QMainWindow):
         self.controller: UIController | None = None 
         self.processing_thread: ProcessingThread | None = None
         self.selected_font_path: str | None = None # Store selected font path
+        self.selected_font_name: str | None = None # Display name derived from the path
 
         self._init_ui()
 
     def set_controller(self, controller: UIController):
         self.controller = controller
+        # Queued connection: emissions come from the worker thread, the slot
+        # must run on the GUI thread. Connected once for the window's life.
+        controller.progress_signal.connect(
+            self.update_progress, Qt.ConnectionType.QueuedConnection)
 
     def _init_ui(self):
         main_widget = QWidget()
@@ -157,14 +150,20 @@ class MainGUI(QMainWindow):
         # Log Area
         log_group = QGroupBox("로그")
         log_layout = QVBoxLayout(log_group)
-        self.log_edit = QTextEdit()
+        # QPlainTextEdit keeps appends O(1) (no rich-text relayout) and the
+        # block cap turns the log into a ring buffer for long jobs.
+        self.log_edit = QPlainTextEdit()
         self.log_edit.setReadOnly(True)
+        self.log_edit.setMaximumBlockCount(2000)
         log_layout.addWidget(self.log_edit)
         right_layout.addWidget(log_group)
 
         main_layout.addWidget(left_panel, 1) # Weight 1
         main_layout.addWidget(right_panel, 2) # Weight 2
 
+        # One scan per status message instead of five chained substring tests.
+        self._log_filter = re.compile("청크|저장 중|완료|오류|로딩").search
+
     @Slot()
     def _browse_file(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "PDF 파일 선택", "", "PDF Files (*.pdf)")
@@ -189,11 +188,12 @@ class MainGUI(QMainWindow):
         if file_path:
             self.selected_font_path = file_path
             # Try to get font name, fallback to filename
-            font_name = os.path.splitext(os.path.basename(file_path))[0]
-            self.font_label.setText(f"글꼴: {font_name}")
+            self.selected_font_name = os.path.splitext(os.path.basename(file_path))[0]
+            self.font_label.setText(f"글꼴: {self.selected_font_name}")
             self._append_log(f"글꼴 파일: {file_path}")
         else:
             self.selected_font_path = None
+            self.selected_font_name = None
             self.font_label.setText("글꼴: 기본")
 
     @Slot()
@@ -225,7 +225,7 @@ class MainGUI(QMainWindow):
             "tone": self.tone_combo.currentText(),
             "glossary_path": self.glossary_path, 
             "font_path": self.selected_font_path, # Can be None
-            "font_name": os.path.splitext(os.path.basename(self.selected_font_path))[0] if self.selected_font_path else None,
+            "font_name": self.selected_font_name, # Derived once in _browse_font
             # "font_size": 10 # Could add font size option later
         }
 
@@ -236,10 +236,9 @@ class MainGUI(QMainWindow):
         self.progress_bar.setMaximum(100) # Reset max value potentially
         self.status_label.setText("처리 시작...")
 
-        # Create and start the processing thread
+        # Create and start the processing thread (progress arrives directly
+        # from the controller's signal, connected in set_controller)
         self.processing_thread = ProcessingThread(self.controller, pdf_path, output_dir, options)
-        # Connect signals from the thread to GUI slots
-        self.processing_thread.progress_updated.connect(self.update_progress)
         self.processing_thread.processing_finished.connect(self._processing_finished)
         self.processing_thread.start()
 
@@ -255,7 +254,7 @@ class MainGUI(QMainWindow):
         self.progress_bar.setFormat(f"%p% ({current_step}/{total_steps})")
         self.status_label.setText(status_message)
         # Only log significant status changes to avoid flooding the log
-        if "청크" in status_message or "저장 중" in status_message or "완료" in status_message or "오류" in status_message or "로딩" in status_message:
+        if self._log_filter(status_message):
              self._append_log(f"진행: {status_message}")
 
     @Slot(str)
@@ -278,8 +277,8 @@ class MainGUI(QMainWindow):
 
     def _append_log(self, message: str):
         """Appends a message to the log text area."""
-        self.log_edit.append(message)
-        self.log_edit.verticalScrollBar().setValue(self.log_edit.verticalScrollBar().maximum()) # Auto-scroll
+        # QPlainTextEdit auto-scrolls while the view is at the bottom.
+        self.log_edit.appendPlainText(message)
 
 # Main execution block (usually in main.py)
 # if __name__ == '__main__':
@@ -1,30 +1,39 @@
-from pydantic import BaseModel, Field
+from dataclasses import dataclass
 from typing import List, Tuple
 
-class BoundingBox(BaseModel):
+# Plain slotted dataclasses: these objects are created once per text block
+# (tens of thousands per document), all from our own code, so per-instance
+# schema validation buys nothing. Slots cut per-instance memory and speed
+# up the attribute access the pipeline does constantly.
+
+@dataclass(slots=True)
+class BoundingBox:
     """Represents the bounding box of a text block."""
     x: float
     y: float
     width: float
     height: float
 
-class Block(BaseModel):
+@dataclass(slots=True)
+class Block:
     """Represents a text block extracted from a page."""
-    id: str = Field(..., description="Unique identifier for the block")
+    id: str # Unique identifier for the block
     text: str
     bbox: BoundingBox
     page_number: int
     # Potentially add line/paragraph info if needed from DI
 
-class MergedBlock(BaseModel):
+@dataclass(slots=True)
+class MergedBlock:
     """Represents a block of text after merging (e.g., a paragraph)."""
     id: str # Could be the ID of the first original block
     text: str
     original_block_ids: List[str]
     page_number: int
-    # BBox might need recalculation or represent the union of original boxes
+    bbox: BoundingBox # Union of the original blocks' boxes
 
-class TranslatedBlock(BaseModel):
+@dataclass(slots=True)
+class TranslatedBlock:
     """Represents a block with its translated text and original position."""
     id: str # Matches original Block or MergedBlock ID
     original_text: str
@@ -32,8 +41,9 @@ class TranslatedBlock(BaseModel):
     bbox: BoundingBox # Crucial for layout
     page_number: int
 
-class Chunk(BaseModel):
+@dataclass(slots=True)
+class Chunk:
     """Represents a chunk of pages to be processed."""
     id: int
     page_numbers: Tuple[int, int] # Start and end page number (1-based, inclusive)
-    # Potentially store file path or reference 
\ No newline at end of file
+    # Potentially store file path or reference